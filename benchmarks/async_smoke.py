@@ -0,0 +1,86 @@
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.db_access import TemporaryPostgres
+
+
+async def run_checks():
+    # аргументы как из GUI и загрузчиков: id и числа строками, даты с часовым поясом
+    from db import async_requests as requests
+    from db.async_database import perform_async_connection, close_async_connection
+    import db.database
+
+    failures = []
+
+    async def check(name, call):
+        try:
+            result = await call
+        except Exception as exc:
+            failures.append(name)
+            print(f"  {name:<36} ошибка: {exc!r}")
+            return None
+        errors = [error for batch in result for error in batch['errors']] if isinstance(result, list) else []
+        if errors:
+            failures.append(name)
+            print(f"  {name:<36} ошибки: {errors}")
+        else:
+            print(f"  {name:<36} ok")
+        return result
+
+    params = {key: os.environ[key] for key in ('DB_USER', 'DB_PASSWORD', 'DB_HOST', 'DB_PORT', 'DB_NAME')}
+    if not db.database.perform_connection(params) or not db.database.perform_recreate_tables():
+        return ['подключение']
+    if not await perform_async_connection(params):
+        db.database.engine.dispose()
+        return ['подключение']
+    try:
+        aware = datetime.now(timezone(timedelta(hours=3))) - timedelta(minutes=5)
+        experiment_id = await check('create_experiment', requests.create_experiment("smoke", None))
+        run_id = await check('create_run', requests.create_run(str(experiment_id), "0.5", True))
+        image_id = await check('create_image', requests.create_image(str(run_id), "/smoke/one.png", 'blur',
+                                                                     added_date=aware, coordinates=[1, 2, 3, 4]))
+        await check('bulk_create_runs', requests.bulk_create_runs([{'experiment_id': experiment_id}]))
+        for use_copy in (False, True):
+            rows = [{'run_id': run_id, 'file_path': f"/smoke/bulk_{use_copy}_{i}.png", 'attack_type': 'noise',
+                     'added_date': aware} for i in range(3)]
+            await check(f'bulk_create_images(use_copy={use_copy})',
+                        requests.bulk_create_images(rows, use_copy=use_copy))
+        await check('update_run', requests.update_run(str(experiment_id), run_id, "0.75", False))
+        await check('update_image', requests.update_image(image_id, str(run_id), 'adversarial'))
+
+        expected = aware.astimezone(timezone.utc).replace(tzinfo=None)
+        image = await requests.get_image_by_id(image_id) if image_id is not None else None
+        if image is None or image.added_date != expected:
+            failures.append('added_date')
+            print(f"  {'added_date в UTC':<36} ожидалось {expected}, записано {image and image.added_date}")
+    finally:
+        await close_async_connection()
+        db.database.engine.dispose()
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.async_smoke',
+                                     description="Проверка записи через db.async_requests на одноразовом PostgreSQL")
+    parser.add_argument('--pg-bin', default=None, help="каталог с initdb и pg_ctl")
+    parser.add_argument('--keep', action='store_true', help="не удалять каталог кластера")
+    args = parser.parse_args(argv)
+
+    with TemporaryPostgres(args.pg_bin, args.keep) as params:
+        # настройки читаются при импорте db.config, поэтому окружение задаётся до импорта модулей db
+        os.environ.update({key: str(value) for key, value in params.items()})
+        os.environ.update({'DB_CACHE_SIZE': '0', 'DB_ECHO': 'false'})
+        failures = asyncio.run(run_checks())
+
+    if failures:
+        print(f"не прошли: {', '.join(failures)}")
+        return 1
+    print("асинхронная запись работает")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+DEFAULT_SCALES = [10000, 1000000, 10000000]
+GENERATE_CHUNK = 1000000
+BULK_ROWS = 10000
+PAGE_WALK = 10
+FILTER_COMBINATIONS = [
+    {'sort_id': sort_id, 'file_type': file_type, 'attack_type': attack_type}
+    for sort_id in (None, 'asc', 'desc')
+    for file_type in (None, '.png')
+    for attack_type in (None, 'blur')
+]
+
+
+def find_pg_bin(pg_bin=None):
+    if pg_bin:
+        return pg_bin
+    if shutil.which('initdb'):
+        return os.path.dirname(shutil.which('initdb'))
+    candidates = sorted(glob.glob('/usr/lib/postgresql/*/bin/initdb'))
+    if candidates:
+        return os.path.dirname(candidates[-1])
+    raise RuntimeError("initdb не найден: укажите каталог с бинарниками PostgreSQL через --pg-bin")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('localhost', 0))
+        return sock.getsockname()[1]
+
+
+class TemporaryPostgres:
+    # одноразовый кластер во временном каталоге, удаляется после замеров
+    def __init__(self, pg_bin=None, keep=False):
+        self.pg_bin = find_pg_bin(pg_bin)
+        self.keep = keep
+        self.port = free_port()
+        self.directory = None
+
+    def run(self, tool, *args):
+        subprocess.run([os.path.join(self.pg_bin, tool), *args], check=True, stdout=subprocess.DEVNULL)
+
+    def __enter__(self):
+        self.directory = tempfile.mkdtemp(prefix='db_bench_')
+        data = os.path.join(self.directory, 'data')
+        self.run('initdb', '-D', data, '-U', 'bench', '--auth=trust', '-E', 'UTF8')
+        self.run('pg_ctl', '-D', data, '-l', os.path.join(self.directory, 'postgres.log'), '-w',
+                 '-o', f"-p {self.port} -k {self.directory} -c listen_addresses=localhost", 'start')
+        return {'DB_USER': 'bench', 'DB_PASSWORD': '', 'DB_HOST': 'localhost', 'DB_PORT': self.port,
+                'DB_NAME': 'postgres'}
+
+    def __exit__(self, *exc):
+        self.run('pg_ctl', '-D', os.path.join(self.directory, 'data'), '-m', 'fast', '-w', 'stop')
+        if self.keep:
+            print(f"каталог кластера сохранён: {self.directory}")
+        else:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def generate_data(scale):
+    from sqlalchemy import text
+    import db.database
+    from db.requests import refresh_image_rollups
+
+    runs = max(1, scale // 1000)
+    experiments = max(1, runs // 10)
+    with db.database.engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO experiments (name, description, created_date) "
+            "SELECT 'experiment ' || g, 'synthetic', CURRENT_DATE - (g % 365) FROM generate_series(1, :n) g"
+        ), {'n': experiments})
+        conn.execute(text(
+            "INSERT INTO runs (experiment_id, run_date, accuracy, flagged) "
+            "SELECT 1 + g % :experiments, NOW() - (g % 1000) * INTERVAL '1 hour', random(), g % 3 = 0 "
+            "FROM generate_series(1, :n) g"
+        ), {'n': runs, 'experiments': experiments})
+    for start in range(1, scale + 1, GENERATE_CHUNK):
+        stop = min(scale, start + GENERATE_CHUNK - 1)
+        with db.database.engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO images (run_id, file_path, original_name, attack_type, coordinates) "
+                "SELECT 1 + g % :runs, '/data/run' || (1 + g % :runs) || '/img_' || g "
+                "|| (ARRAY['.png', '.jpg', '.jpeg'])[1 + g % 3], 'img_' || g, "
+                "((ARRAY['no_attack', 'blur', 'noise', 'adversarial', 'other'])[1 + g % 5])::attack_type_enum, "
+                "ARRAY[(g * 7) % 1000, (g * 13) % 1000, 10 + g % 200, 10 + (g * 3) % 200] "
+                "FROM generate_series(:start, :stop) g"
+            ), {'runs': runs, 'start': start, 'stop': stop})
+        print(f"  images: {stop}/{scale}")
+    refresh_image_rollups()
+    with db.database.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE"))
+    return {'experiments': experiments, 'runs': runs, 'images': scale}
+
+
+def measure(name, fn, repeat, args_for=None, **params):
+    samples, rows = [], None
+    for i in range(repeat):
+        args = args_for(i) if args_for else ()
+        started = time.perf_counter()
+        result = fn(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+        if isinstance(result, list):
+            rows = len(result)
+    samples.sort()
+    result = {
+        'name': name,
+        'params': params,
+        'repeat': repeat,
+        'median_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[min(len(samples) - 1, round(0.95 * (len(samples) - 1)))], 3),
+        'min_ms': round(samples[0], 3),
+        'rows': rows,
+    }
+    print(f"  {name:<28}{json.dumps(params, ensure_ascii=False):<60}{result['median_ms']:>12.2f} мс")
+    return result
+
+
+def run_scale(scale, repeat, full_list_repeat, seed):
+    from db.database import perform_recreate_tables
+    from db import requests
+
+    rng = random.Random(seed)
+    print(f"масштаб {scale}: подготовка данных")
+    if not perform_recreate_tables():
+        # на недочищенной схеме замеры несопоставимы с другими прогонами
+        print(f"масштаб {scale} пропущен: таблицы не пересозданы")
+        return None
+    started = time.perf_counter()
+    counts = generate_data(scale)
+    print(f"  данные созданы за {time.perf_counter() - started:.1f} с")
+
+    runs = counts['runs']
+    ids = rng.sample(range(1, scale + 1), min(scale, repeat * 2))
+    results = [
+        measure('create_image', requests.create_image, repeat,
+                args_for=lambda i: (1 + i % runs, f"/bench/create/{scale}_{i}.png", 'blur', f"create_{i}",
+                                    None, [10, 10, 20, 20])),
+    ]
+
+    def bulk_rows(prefix):
+        return [{'run_id': 1 + i % runs, 'file_path': f"/bench/{prefix}/{scale}_{i}.png", 'original_name': None,
+                 'attack_type': 'noise', 'coordinates': [5, 5, 10, 10]} for i in range(BULK_ROWS)]
+    results.append(measure('bulk_create_images', requests.bulk_create_images, 1,
+                           args_for=lambda i: (bulk_rows('copy'),), rows=BULK_ROWS, use_copy=True))
+    results.append(measure('bulk_create_images', lambda rows: requests.bulk_create_images(rows, use_copy=False), 1,
+                           args_for=lambda i: (bulk_rows('insert'),), rows=BULK_ROWS, use_copy=False))
+
+    for filters in FILTER_COMBINATIONS:
+        results.append(measure('get_all_images_filtered', requests.get_all_images_filtered, full_list_repeat,
+                               args_for=lambda i, f=filters: (f,), **filters))
+
+    for filters in FILTER_COMBINATIONS:
+        results.append(measure('get_images_page', requests.get_images_page, repeat,
+                               args_for=lambda i, f=filters: (f,), position='first', **filters))
+    middle = scale // 2
+    for sort_id in ('asc', 'desc'):
+        filters = {'sort_id': sort_id, 'file_type': None, 'attack_type': None}
+        results.append(measure('get_images_page', requests.get_images_page, repeat,
+                               args_for=lambda i, f=filters: (f, middle), position='middle', sort_id=sort_id))
+
+        def walk(f=filters):
+            after_id = None
+            for _ in range(PAGE_WALK):
+                page = requests.get_images_page(f, after_id)
+                if not page:
+                    break
+                after_id = page[-1].image_id
+        results.append(measure('get_images_page', walk, repeat, position=f'walk_{PAGE_WALK}', sort_id=sort_id))
+
+    results.append(measure('search_images', requests.search_images, repeat, args_for=lambda i: ('img_12',),
+                           term='img_12'))
+    results.append(measure('search_images', requests.search_images, repeat, args_for=lambda i: ('/data/run1/',),
+                           term='/data/run1/'))
+    results.append(measure('find_images_overlapping', requests.find_images_overlapping, repeat,
+                           args_for=lambda i: ((100, 100, 120, 120),), region=[100, 100, 120, 120]))
+    results.append(measure('get_image_by_id', requests.get_image_by_id, repeat, args_for=lambda i: (ids[i],)))
+
+    results.append(measure('update_image', requests.update_image, repeat,
+                           args_for=lambda i: (ids[i], 1 + rng.randrange(runs), 'adversarial')))
+    results.append(measure('update_run', requests.update_run, repeat,
+                           args_for=lambda i: (1, 1 + i % runs, 0.5, True)))
+    results.append(measure('delete_image', requests.delete_image, repeat, args_for=lambda i: (ids[repeat + i],)))
+
+    for result in results:
+        result['scale'] = scale
+    return results
+
+
+def compare(results, baseline_path, threshold, min_delta_ms):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    def key(result):
+        return result['name'], result['scale'], json.dumps(result['params'], sort_keys=True)
+
+    previous = {key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        old = previous.get(key(result))
+        if not old or result['median_ms'] - old['median_ms'] < min_delta_ms:
+            continue
+        if old['median_ms'] > 0 and result['median_ms'] / old['median_ms'] > threshold:
+            regressions.append((result, old))
+    for result, old in regressions:
+        print(f"РЕГРЕССИЯ {result['name']} {result['scale']} {json.dumps(result['params'], ensure_ascii=False)}: "
+              f"{old['median_ms']:.2f} -> {result['median_ms']:.2f} мс")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.db_access',
+                                     description="Замеры функций db.requests на одноразовом PostgreSQL")
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--full-list-repeat', type=int, default=1,
+                        help="повторов get_all_images_filtered, выгружающей все подходящие строки")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--pg-bin', default=None, help="каталог с initdb и pg_ctl")
+    parser.add_argument('--keep', action='store_true', help="не удалять каталог кластера")
+    parser.add_argument('--json', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=None, help="JSON прошлого прогона для сравнения")
+    parser.add_argument('--threshold', type=float, default=1.25, help="допустимое замедление медианы")
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help="меньшие замедления считаются шумом")
+    args = parser.parse_args(argv)
+
+    with TemporaryPostgres(args.pg_bin, args.keep) as params:
+        # настройки читаются при импорте db.config, поэтому окружение задаётся до импорта модулей db
+        os.environ.update({key: str(value) for key, value in params.items()})
+        os.environ.update({'DB_CACHE_SIZE': '0', 'DB_SLOW_QUERY_MS': '0', 'DB_ECHO': 'false'})
+        from sqlalchemy import text
+        import db.database
+
+        if not db.database.perform_connection(params):
+            return 1
+        with db.database.engine.connect() as conn:
+            server_version = conn.execute(text("SHOW server_version")).scalar()
+
+        results = []
+        failed_scales = []
+        for scale in args.scales:
+            scale_results = run_scale(scale, args.repeat, args.full_list_repeat, args.seed)
+            if scale_results is None:
+                failed_scales.append(scale)
+            else:
+                results.extend(scale_results)
+        db.database.engine.dispose()
+
+    report = {
+        'meta': {
+            'started': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'postgres': server_version,
+            'repeat': args.repeat,
+            'seed': args.seed,
+            'failed_scales': failed_scales,
+        },
+        'results': results,
+    }
+    with open(args.json, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"результаты записаны в {args.json}")
+
+    if args.baseline and compare(results, args.baseline, args.threshold, args.min_delta_ms):
+        return 2
+    return 1 if failed_scales else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+MODES = ('overlay', 'copy')
+
+
+def make_pixmap(megapixels):
+    from PySide6.QtGui import QPixmap, QColor
+
+    width = int((megapixels * 1_000_000 * 3 / 2) ** 0.5)
+    pixmap = QPixmap(width, width * 2 // 3)
+    pixmap.fill(QColor(90, 120, 150))
+    return pixmap
+
+
+def make_form(mode, pixmap):
+    from PySide6.QtCore import Qt
+    from PySide6.QtGui import QPainter, QPen, QColor
+    from gui.add_widget import ImageForm
+
+    form = ImageForm()
+    form.original_size = pixmap.size()
+    canvas = form.image_canvas
+    canvas.setPixmap(pixmap)
+    if mode == 'copy':
+        # прежняя схема: копия исходника, рамка на копии и масштабирование всей картинки на каждое движение мыши
+        def update_image_display():
+            copy = pixmap.copy()
+            painter = QPainter(copy)
+            painter.setPen(QPen(QColor(255, 0, 0), 2))
+            if form.current_rect:
+                painter.drawRect(form.current_rect)
+            painter.end()
+            canvas._scaled = copy.scaled(canvas.width(), canvas.height(), Qt.AspectRatioMode.KeepAspectRatio,
+                                         Qt.TransformationMode.SmoothTransformation)
+            canvas.update()
+
+        form.update_image_display = update_image_display
+    return form
+
+
+def send_mouse(widget, kind, point):
+    from PySide6.QtCore import Qt, QPointF
+    from PySide6.QtGui import QMouseEvent
+    from PySide6.QtWidgets import QApplication
+
+    buttons = Qt.MouseButton.NoButton if kind == QMouseEvent.Type.MouseButtonRelease else Qt.MouseButton.LeftButton
+    event = QMouseEvent(kind, QPointF(point), widget.mapToGlobal(QPointF(point)), Qt.MouseButton.LeftButton,
+                        buttons, Qt.KeyboardModifier.NoModifier)
+    QApplication.sendEvent(widget, event)
+
+
+def measure(app, mode, megapixels, steps):
+    from PySide6.QtCore import QPoint
+    from PySide6.QtGui import QMouseEvent
+
+    pixmap = make_pixmap(megapixels)
+    form = make_form(mode, pixmap)
+    canvas = form.image_canvas
+    form.resize(1000, 800)
+    form.show()
+    app.processEvents()
+
+    image_rect = canvas.image_rect()
+    start = image_rect.topLeft() + QPoint(image_rect.width() // 10, image_rect.height() // 10)
+    send_mouse(canvas, QMouseEvent.Type.MouseButtonPress, start)
+    app.processEvents()
+
+    frames = []
+    for step in range(1, steps + 1):
+        point = start + QPoint(image_rect.width() * 8 * step // (10 * steps),
+                               image_rect.height() * 8 * step // (10 * steps))
+        started = time.perf_counter()
+        send_mouse(canvas, QMouseEvent.Type.MouseMove, point)
+        # кадр считается от события мыши до отрисовки изменённой области
+        app.processEvents()
+        frames.append((time.perf_counter() - started) * 1000)
+    send_mouse(canvas, QMouseEvent.Type.MouseButtonRelease, point)
+    app.processEvents()
+
+    form.close()
+    form.deleteLater()
+    app.processEvents()
+    frames.sort()
+    p95 = frames[min(len(frames) - 1, int(len(frames) * 0.95))]
+    return {'mode': mode, 'megapixels': megapixels, 'frames': len(frames),
+            'p50_ms': round(statistics.median(frames), 2), 'p95_ms': round(p95, 2), 'max_ms': round(frames[-1], 2),
+            'fps_p95': round(1000 / p95, 1) if p95 > 0 else None}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.image_canvas',
+                                     description="Время кадра при рисовании рамки в окне аннотирования")
+    parser.add_argument('--megapixels', type=float, nargs='+', default=[12, 24])
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--steps', type=int, default=120)
+    parser.add_argument('--target-fps', type=float, default=60,
+                        help="код возврата 1, если p95 кадра overlay медленнее этой частоты")
+    parser.add_argument('--offscreen', action='store_true', help="рисовать без окна (QT_QPA_PLATFORM=offscreen)")
+    parser.add_argument('--json', default=None, help="сохранить результаты в JSON")
+    args = parser.parse_args(argv)
+
+    if args.offscreen:
+        os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    results = []
+    budget_ms = 1000 / args.target_fps
+    slow = False
+    print(f"{'режим':<10}{'Мп':>6}{'p50, мс':>10}{'p95, мс':>10}{'макс, мс':>11}{'кадр/с (p95)':>15}")
+    for megapixels in args.megapixels:
+        for mode in args.modes:
+            result = measure(app, mode, megapixels, args.steps)
+            results.append(result)
+            print(f"{mode:<10}{megapixels:>6g}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+                  f"{result['max_ms']:>11.2f}{result['fps_p95'] or 0:>15.1f}")
+            if mode == 'overlay' and result['p95_ms'] > budget_ms:
+                slow = True
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if slow:
+        print(f"overlay медленнее {args.target_fps:g} кадров/с")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
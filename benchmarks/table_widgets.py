@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, datetime
+from types import SimpleNamespace
+
+TABLES = ('experiments', 'runs')
+MODES = ('delegate', 'widgets')
+
+
+def make_rows(table, count):
+    if table == 'experiments':
+        return [SimpleNamespace(experiment_id=i, name=f"experiment {i}", description="описание",
+                                created_date=date(2024, 1, 1)) for i in range(1, count + 1)]
+    return [SimpleNamespace(run_id=i, experiment_id=i % 100 + 1, run_date=datetime(2024, 1, 1),
+                            accuracy=0.5, flagged=bool(i % 2)) for i in range(1, count + 1)]
+
+
+def make_dialog(table):
+    from gui.view_widget import ExperimentsTableDialog, RunsTableDialog
+
+    base = ExperimentsTableDialog if table == 'experiments' else RunsTableDialog
+
+    # данные подставляются напрямую, без обращения к базе
+    class BenchmarkDialog(base):
+        def load_data(self):
+            pass
+
+    return BenchmarkDialog()
+
+
+def add_cell_widgets(dialog):
+    # прежняя схема: отдельная QPushButton в каждой строке, для сравнения с делегатом
+    from PySide6.QtWidgets import QPushButton
+
+    model = dialog.table.model()
+    column = model.columnCount() - 1
+    for row in range(model.rowCount()):
+        dialog.table.setIndexWidget(model.index(row, column), QPushButton("Редактировать"))
+
+
+def measure(app, table, mode, count, scroll_steps, resize_steps):
+    from PySide6.QtWidgets import QWidget
+
+    dialog = make_dialog(table)
+    dialog.resize(1000, 600)
+    dialog.show()
+    app.processEvents()
+    rows = make_rows(table, count)
+
+    started = time.perf_counter()
+    dialog.fill_table(rows)
+    if mode == 'widgets':
+        add_cell_widgets(dialog)
+    app.processEvents()
+    dialog.table.viewport().repaint()
+    load = time.perf_counter() - started
+
+    scrollbar = dialog.table.verticalScrollBar()
+    started = time.perf_counter()
+    for step in range(scroll_steps):
+        scrollbar.setValue(scrollbar.maximum() * step // max(scroll_steps - 1, 1))
+        app.processEvents()
+        dialog.table.viewport().repaint()
+    scroll = (time.perf_counter() - started) / scroll_steps
+
+    started = time.perf_counter()
+    for step in range(resize_steps):
+        dialog.resize(1000 + (step % 2) * 200, 600)
+        app.processEvents()
+        dialog.table.viewport().repaint()
+    resize = (time.perf_counter() - started) / resize_steps
+
+    widgets = len(dialog.table.findChildren(QWidget))
+    dialog.close()
+    dialog.deleteLater()
+    app.processEvents()
+    return {'table': table, 'mode': mode, 'rows': count, 'load_s': round(load, 3),
+            'scroll_frame_ms': round(scroll * 1000, 2), 'resize_frame_ms': round(resize * 1000, 2),
+            'widgets': widgets}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.table_widgets',
+                                     description="Время загрузки, прокрутки и ресайза таблиц просмотра")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--tables', nargs='+', choices=TABLES, default=list(TABLES))
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--scroll-steps', type=int, default=200)
+    parser.add_argument('--resize-steps', type=int, default=20)
+    parser.add_argument('--offscreen', action='store_true', help="рисовать без окна (QT_QPA_PLATFORM=offscreen)")
+    parser.add_argument('--json', default=None, help="сохранить результаты в JSON")
+    args = parser.parse_args(argv)
+
+    if args.offscreen:
+        os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    results = []
+    print(f"{'таблица':<12}{'режим':<10}{'строк':>8}{'загрузка, с':>14}{'прокрутка, мс':>16}"
+          f"{'ресайз, мс':>13}{'виджетов':>10}")
+    for table in args.tables:
+        for count in args.rows:
+            for mode in args.modes:
+                result = measure(app, table, mode, count, args.scroll_steps, args.resize_steps)
+                results.append(result)
+                print(f"{table:<12}{mode:<10}{count:>8}{result['load_s']:>14.3f}{result['scroll_frame_ms']:>16.2f}"
+                      f"{result['resize_frame_ms']:>13.2f}{result['widgets']:>10}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
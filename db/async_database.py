@@ -0,0 +1,51 @@
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from db.cache import cache
+from db.config import settings
+from db.database import get_engine_kwargs
+from db.query_stats import query_stats
+
+async_engine = None
+AsyncSessionLocal = None
+
+
+def get_async_engine_kwargs(params):
+    kwargs = get_engine_kwargs(params)
+    # asyncpg не понимает libpq-параметр options, таймаут передаётся через server_settings
+    kwargs.pop('connect_args', None)
+    statement_timeout = int(params.get('DB_STATEMENT_TIMEOUT', settings.DB_STATEMENT_TIMEOUT))
+    if statement_timeout > 0:
+        kwargs['connect_args'] = {'server_settings': {'statement_timeout': str(statement_timeout)}}
+    return kwargs
+
+
+async def perform_async_connection(params):
+    global async_engine, AsyncSessionLocal
+    DATABASE_URL = f"postgresql+asyncpg://{params['DB_USER']}:{params['DB_PASSWORD']}@{params['DB_HOST']}:{params['DB_PORT']}/{params['DB_NAME']}"
+
+    if async_engine is not None:
+        await async_engine.dispose()
+    cache.clear()
+    async_engine = create_async_engine(DATABASE_URL, **get_async_engine_kwargs(params))
+    query_stats.install(async_engine.sync_engine)
+    try:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            print("Асинхронное подключение к базе данных успешно")
+    except Exception as exc:
+        print("Ошибка при асинхронном подключении к базе данных:", repr(exc))
+
+        return False
+    # объекты остаются читаемыми после commit: ленивая подгрузка вне await в asyncio невозможна
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    return True
+
+
+async def close_async_connection():
+    global async_engine, AsyncSessionLocal
+    if async_engine is not None:
+        await async_engine.dispose()
+    async_engine = None
+    AsyncSessionLocal = None
@@ -0,0 +1,283 @@
+import logging
+import time
+from datetime import datetime, UTC
+from functools import wraps
+
+from pydantic import ValidationError
+from sqlalchemy import select, text, insert, delete
+
+import db.async_database
+from db.cache import cached, invalidates
+from db.query_stats import query_stats
+from db.models import Experiment, Run, Image, AttackTypeEnum
+from db.requests import (
+    BULK_BATCH_SIZE, IMAGES_PAGE_SIZE, EXPERIMENT_ROW_COLUMNS, RUN_ROW_COLUMNS, select_images_filtered,
+    _rollup_statements, _count_rollups, _batched, _validate_batch, _parent_ids_query, _split_by_parents,
+    _group_by_columns, _renumber_errors, _naive_utc
+)
+from db.schemas import ExperimentCreate, RunCreate, ImageCreate, ImageEdit, RunEdit
+
+logger = logging.getLogger(__name__)
+
+
+# асинхронные аналоги функций db.requests для фоновых сервисов загрузки: те же схемы, фильтры и кэш,
+# но запросы одного процесса выполняются конкурентно через пул asyncpg
+def with_async_session(commit = False):
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            async with db.async_database.AsyncSessionLocal() as session:
+                kwargs['session'] = session
+                started = time.perf_counter()
+                result = await func(*args, **kwargs)
+                if commit:
+                    await session.commit()
+                query_stats.record_call(func.__name__, time.perf_counter() - started, result)
+                return result
+        return wrapper
+    return decorator
+
+async def _bump_rollups(session, deltas):
+    for stmt in _rollup_statements(deltas):
+        await session.execute(stmt)
+
+@invalidates(('experiment', 'list'))
+@with_async_session(commit=True)
+async def create_experiment(name, description = None, *, session):
+    data = ExperimentCreate(name=name, description=description, created_date=datetime.now().date())
+    exp = Experiment(name=data.name, description=data.description, created_date=data.created_date)
+    session.add(exp)
+    await session.flush()
+    return exp.experiment_id
+
+@invalidates(('run', 'list'))
+@with_async_session(commit=True)
+async def create_run(experiment_id, accuracy = None, flagged = None, *, session):
+    # asyncpg, в отличие от psycopg2, не приводит типы: в ORM передаются значения после схемы,
+    # даты — наивными в UTC, как у колонок TIMESTAMP
+    data = RunCreate(experiment_id=experiment_id, run_date=datetime.now(UTC), accuracy=accuracy, flagged=flagged)
+    if await session.get(Experiment, data.experiment_id) is None:
+        raise ValueError(f"Experiment с id={experiment_id} не найден")
+
+    run = Run(experiment_id=data.experiment_id, run_date=_naive_utc(data.run_date), accuracy=data.accuracy,
+              flagged=data.flagged)
+    session.add(run)
+    await session.flush()
+    return run.run_id
+
+@invalidates(('image', 'list'))
+@with_async_session(commit=True)
+async def create_image(run_id, file_path, attack_type, original_name = None, added_date = None, coordinates = None,
+                       *, session):
+    data = ImageCreate(run_id=run_id, file_path=file_path, original_name=original_name, attack_type=attack_type,
+                       added_date=added_date, coordinates=coordinates)
+    if await session.get(Run, data.run_id) is None:
+        raise ValueError(f"Run с id={run_id} не найден")
+    img = Image(run_id=data.run_id, file_path=data.file_path, original_name=data.original_name,
+                attack_type=data.attack_type, added_date=_naive_utc(data.added_date), coordinates=data.coordinates)
+    session.add(img)
+    await session.flush()
+    await _bump_rollups(session, {(data.run_id, data.attack_type): 1})
+    return img.image_id
+
+async def _check_parents(session, valid, errors, key, parent_column, parent_name):
+    existing = set(await session.scalars(_parent_ids_query(valid, key, parent_column)))
+    return _split_by_parents(valid, errors, existing, key, parent_name)
+
+async def _insert_rows(session, model, rows, columns):
+    for group in _group_by_columns(rows, columns).values():
+        await session.execute(insert(model), [{column: _naive_utc(value) for column, value in values.items()}
+                                              for values in group])
+
+def _record_value(value):
+    if isinstance(value, AttackTypeEnum):
+        return value.name
+    return _naive_utc(value)
+
+async def _copy_rows(session, model, rows, columns):
+    # бинарный COPY asyncpg в транзакции сессии
+    connection = await session.connection()
+    driver_connection = (await connection.get_raw_connection()).driver_connection
+    for group_columns, group in _group_by_columns(rows, columns).items():
+        await driver_connection.copy_records_to_table(
+            model.__tablename__, columns=list(group_columns),
+            records=[tuple(_record_value(values[column]) for column in group_columns) for values in group]
+        )
+
+async def _bulk_load(session, rows, *, schema, model, columns, defaults=None, parent=None,
+                     batch_size=BULK_BATCH_SIZE, loader=_insert_rows, after_load=None, row_numbers=None):
+    report = []
+    for number, batch in enumerate(_batched(rows, batch_size)):
+        offset = number * batch_size
+        valid, errors = _validate_batch(batch, offset, schema, defaults or {})
+        inserted = 0
+        try:
+            if parent is not None and valid:
+                valid = await _check_parents(session, valid, errors, *parent)
+            if valid:
+                loaded = [row for _, row in valid]
+                await loader(session, model, loaded, columns)
+                if after_load is not None:
+                    await after_load(session, loaded)
+                await session.commit()
+                inserted = len(valid)
+        except Exception as exc:
+            await session.rollback()
+            errors.append({'index': None, 'error': f"пакет {number} не загружен: {exc}"})
+        _renumber_errors(errors, row_numbers)
+        for error in errors:
+            logger.error(f"{model.__tablename__}[{error['index']}]: {error['error']}")
+        report.append({'batch': number, 'inserted': inserted, 'errors': errors})
+    return report
+
+@invalidates(('experiment', 'list'))
+@with_async_session()
+async def bulk_create_experiments(experiments, batch_size=BULK_BATCH_SIZE, *, session):
+    return await _bulk_load(session, experiments, schema=ExperimentCreate, model=Experiment,
+                            columns=('name', 'description', 'created_date'),
+                            defaults={'created_date': datetime.now().date()}, batch_size=batch_size)
+
+@invalidates(('run', 'list'))
+@with_async_session()
+async def bulk_create_runs(runs, batch_size=BULK_BATCH_SIZE, *, session):
+    return await _bulk_load(session, runs, schema=RunCreate, model=Run,
+                            columns=('experiment_id', 'run_date', 'accuracy', 'flagged'),
+                            defaults={'run_date': datetime.now(UTC)},
+                            parent=('experiment_id', Experiment.experiment_id, 'Experiment'), batch_size=batch_size)
+
+@invalidates(('image', 'list'))
+@with_async_session()
+async def bulk_create_images(images, batch_size=BULK_BATCH_SIZE, use_copy=True, row_numbers=None, *, session):
+    return await _bulk_load(session, images, schema=ImageCreate, model=Image,
+                            columns=('run_id', 'file_path', 'original_name', 'attack_type', 'added_date',
+                                     'coordinates', 'content_hash'),
+                            parent=('run_id', Run.run_id, 'Run'), batch_size=batch_size,
+                            loader=_copy_rows if use_copy else _insert_rows,
+                            after_load=lambda session, rows: _bump_rollups(session, _count_rollups(rows)),
+                            row_numbers=row_numbers)
+
+@cached('experiment')
+@with_async_session()
+async def get_experiment_max_id(*, session):
+    result = await session.execute(text("SELECT COALESCE(MAX(experiment_id), 0) FROM experiments"))
+    return result.scalar()
+
+@cached('run')
+@with_async_session()
+async def get_run_max_id(*, session):
+    result = await session.execute(text("SELECT COALESCE(MAX(run_id), 0) FROM runs"))
+    return result.scalar()
+
+@cached('experiment')
+@with_async_session()
+async def get_all_experiments(*, session):
+    return (await session.execute(select(*EXPERIMENT_ROW_COLUMNS))).all()
+
+@cached('experiment', by_id=True)
+@with_async_session()
+async def get_experiment_by_id(experiment_id, *, session):
+    return await session.get(Experiment, experiment_id)
+
+@invalidates(('experiment', 'experiment_id'))
+@with_async_session(commit=True)
+async def update_experiment(experiment_id, name, description, *, session):
+    try:
+        update_data = ExperimentCreate(name=name, description=description)
+    except ValidationError as e:
+        raise ValueError(f"некорректные изменения: {e}") from e
+    experiment = await session.get(Experiment, experiment_id)
+    if experiment:
+        experiment.name = update_data.name
+        experiment.description = update_data.description
+        return experiment_id
+
+# удаление идёт одним DELETE: прогоны, изображения и сводка удаляются каскадом внешних ключей,
+# без загрузки дочерних объектов в сессию
+@invalidates(('experiment', 'experiment_id'), ('run', 'all'), ('image', 'all'))
+@with_async_session(commit=True)
+async def delete_experiment(experiment_id, *, session):
+    result = await session.execute(
+        delete(Experiment).where(Experiment.experiment_id == experiment_id).returning(Experiment.experiment_id)
+    )
+    return result.scalar()
+
+@cached('run')
+@with_async_session()
+async def get_all_runs(*, session):
+    return (await session.execute(select(*RUN_ROW_COLUMNS))).all()
+
+@cached('run', by_id=True)
+@with_async_session()
+async def get_run_by_id(run_id, *, session):
+    return await session.get(Run, run_id)
+
+@invalidates(('run', 'run_id'))
+@with_async_session(commit=True)
+async def update_run(experiment_id, run_id, accuracy, flagged, *, session):
+    try:
+        update_data = RunEdit(experiment_id=experiment_id, accuracy=accuracy, flagged=flagged)
+    except ValidationError as e:
+        raise ValueError(f"некорректные изменения: {e}") from e
+    run = await session.get(Run, run_id)
+    if run:
+        run.accuracy = update_data.accuracy
+        run.flagged = update_data.flagged
+        run.experiment_id = update_data.experiment_id
+        return run_id
+
+@invalidates(('run', 'run_id'), ('image', 'all'))
+@with_async_session(commit=True)
+async def delete_run(run_id, *, session):
+    result = await session.execute(delete(Run).where(Run.run_id == run_id).returning(Run.run_id))
+    return result.scalar()
+
+@cached('image', 'run')
+@with_async_session()
+async def get_images_page(filters, after_id=None, limit=IMAGES_PAGE_SIZE, *, session):
+    stmt = select_images_filtered(filters)
+    if after_id is not None:
+        stmt = stmt.where(Image.image_id < after_id if filters['sort_id'] == 'desc' else Image.image_id > after_id)
+    return (await session.execute(stmt.limit(limit))).all()
+
+async def search_images(term, filters=None, after_id=None, limit=IMAGES_PAGE_SIZE):
+    filters = {'sort_id': None, 'file_type': None, 'attack_type': None, **(filters or {}), 'search': term}
+    return await get_images_page(filters, after_id=after_id, limit=limit)
+
+@cached('image', 'run')
+@with_async_session()
+async def get_image_row(image_id, filters, *, session):
+    return (await session.execute(select_images_filtered(filters).where(Image.image_id == image_id))).first()
+
+@cached('image', by_id=True)
+@with_async_session()
+async def get_image_by_id(image_id, *, session):
+    return await session.get(Image, image_id)
+
+@invalidates(('image', 'image_id'))
+@with_async_session(commit=True)
+async def update_image(image_id, run_id, attack_type, *, session):
+    try:
+        update_data = ImageEdit(run_id=run_id, attack_type=attack_type)
+    except ValidationError as e:
+        raise ValueError(f"некорректные изменения: {e}") from e
+    image = await session.get(Image, image_id)
+    if image:
+        deltas = {(image.run_id, AttackTypeEnum(image.attack_type)): -1}
+        key = (update_data.run_id, update_data.attack_type)
+        deltas[key] = deltas.get(key, 0) + 1
+        image.attack_type = update_data.attack_type
+        image.run_id = update_data.run_id
+        await session.flush()
+        await _bump_rollups(session, deltas)
+        return image_id
+
+@invalidates(('image', 'image_id'))
+@with_async_session(commit=True)
+async def delete_image(image_id, *, session):
+    result = await session.execute(
+        delete(Image).where(Image.image_id == image_id).returning(Image.run_id, Image.attack_type)
+    )
+    row = result.first()
+    if row:
+        await _bump_rollups(session, {(row.run_id, AttackTypeEnum(row.attack_type)): -1})
+        return image_id
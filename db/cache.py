@@ -0,0 +1,185 @@
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from db.config import settings
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    hash(value)
+    return value
+
+
+def _entity_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+class QueryCache:
+    def __init__(self, maxsize=settings.DB_CACHE_SIZE, ttl=settings.DB_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()
+        self._counters = {}
+        self.evictions = 0
+        self.generation = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0 and self.ttl > 0
+
+    def _count(self, name, field):
+        counters = self._counters.setdefault(name, {'hits': 0, 'misses': 0})
+        counters[field] += 1
+
+    def get(self, name, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['expires'] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._count(name, 'hits')
+                return True, entry['value']
+            if entry is not None:
+                del self._entries[key]
+            self._count(name, 'misses')
+            return False, None
+
+    def set(self, key, value, depends, entity_id=None, generation=None):
+        with self._lock:
+            # чтение, начатое до инвалидации, не должно вернуть в кэш устаревший результат
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = {
+                'value': value,
+                'expires': time.monotonic() + self.ttl,
+                'depends': depends,
+                'entity_id': entity_id,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _drop(self, predicate):
+        with self._lock:
+            self.generation += 1
+            for key in [key for key, entry in self._entries.items() if predicate(entry)]:
+                del self._entries[key]
+
+    def invalidate_lists(self, entity):
+        self._drop(lambda e: e['entity_id'] is None and entity in e['depends'])
+
+    def invalidate_id(self, entity, entity_id):
+        self._drop(lambda e: entity in e['depends'] and (e['entity_id'] is None or
+                                                         (e['depends'][0] == entity and e['entity_id'] == entity_id)))
+
+    def invalidate_all(self, entity):
+        self._drop(lambda e: entity in e['depends'])
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            hits = sum(c['hits'] for c in self._counters.values())
+            misses = sum(c['misses'] for c in self._counters.values())
+            return {
+                'size': len(self._entries),
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+                'evictions': self.evictions,
+                'functions': {name: dict(c) for name, c in self._counters.items()},
+            }
+
+
+cache = QueryCache()
+
+
+def cached(*depends, by_id=False):
+    # depends: сущности, от которых зависит результат; при by_id первый аргумент функции - id сущности depends[0]
+    def decorator(func):
+        name = f"{func.__module__}.{func.__name__}"
+
+        def lookup(args, kwargs):
+            if not cache.enabled:
+                return None, False, None
+            try:
+                key = (name, _freeze(args), _freeze(kwargs))
+            except TypeError:
+                return None, False, None
+            generation = cache.generation
+            found, value = cache.get(name, key)
+            return (key, generation), found, value
+
+        def store(token, args, value):
+            if token is not None:
+                key, generation = token
+                cache.set(key, value, depends, _entity_id(args[0]) if by_id else None, generation)
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                token, found, value = lookup(args, kwargs)
+                if found:
+                    return value
+                value = await func(*args, **kwargs)
+                store(token, args, value)
+                return value
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            token, found, value = lookup(args, kwargs)
+            if found:
+                return value
+            value = func(*args, **kwargs)
+            store(token, args, value)
+            return value
+        return wrapper
+    return decorator
+
+
+def invalidates(*targets):
+    # targets: пары (сущность, область), область - 'list', 'all' или имя аргумента с id изменённой записи
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def invalidate(args, kwargs):
+            arguments = signature.bind_partial(*args, **kwargs).arguments
+            for entity, scope in targets:
+                if scope == 'list':
+                    cache.invalidate_lists(entity)
+                elif scope == 'all':
+                    cache.invalidate_all(entity)
+                else:
+                    cache.invalidate_id(entity, _entity_id(arguments[scope]))
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    invalidate(args, kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                invalidate(args, kwargs)
+        return wrapper
+    return decorator
@@ -9,6 +9,22 @@ class Settings(BaseSettings):
     DB_PORT: int
     DB_NAME: str
 
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT: int = 0
+
+    DB_CACHE_SIZE: int = 1024
+    DB_CACHE_TTL: float = 30.0
+
+    DB_SLOW_QUERY_MS: int = 500
+
+    THUMBNAIL_PACK_PATH: str = "thumbnails.pack"
+    THUMBNAIL_WORKERS: int = 0
+
     model_config = SettingsConfigDict(
         env_file=Path(__file__).parent.parent / ".env",
         env_file_encoding='utf-8'
@@ -1,18 +1,54 @@
-from sqlalchemy import create_engine, text
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from db.cache import cache
+from db.config import settings
+from db.query_stats import query_stats
+
 
 
+logger = logging.getLogger(__name__)
+
 Base = declarative_base()
 engine = None
 SessionLocal = None
 
+ENGINE_OPTIONS = ('DB_ECHO', 'DB_POOL_SIZE', 'DB_MAX_OVERFLOW', 'DB_POOL_TIMEOUT', 'DB_POOL_RECYCLE',
+                  'DB_POOL_PRE_PING', 'DB_STATEMENT_TIMEOUT')
+
+
+def get_engine_kwargs(params):
+    options = {key: params.get(key, getattr(settings, key)) for key in ENGINE_OPTIONS}
+    kwargs = {
+        'echo': bool(options['DB_ECHO']),
+        'pool_size': int(options['DB_POOL_SIZE']),
+        'max_overflow': int(options['DB_MAX_OVERFLOW']),
+        'pool_timeout': int(options['DB_POOL_TIMEOUT']),
+        'pool_recycle': int(options['DB_POOL_RECYCLE']),
+        'pool_pre_ping': bool(options['DB_POOL_PRE_PING']),
+    }
+    statement_timeout = int(options['DB_STATEMENT_TIMEOUT'])
+    if statement_timeout > 0:
+        kwargs['connect_args'] = {'options': f"-c statement_timeout={statement_timeout}"}
+    return kwargs
+
+
 def perform_connection(params):
     global engine, SessionLocal
     DATABASE_URL = f"postgresql://{params['DB_USER']}:{params['DB_PASSWORD']}@{params['DB_HOST']}:{params['DB_PORT']}/{params['DB_NAME']}"
 
-    engine = create_engine(DATABASE_URL, echo=True)
+    if engine is not None:
+        engine.dispose()
+    cache.clear()
+    engine = create_engine(DATABASE_URL, **get_engine_kwargs(params))
+    query_stats.install(engine)
+    event.listen(engine, 'checkout', _attach_ticket)
+    event.listen(engine, 'checkin', _detach_ticket)
     try:
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
@@ -27,11 +63,90 @@ def perform_connection(params):
     return True
 
 
+def get_pool_status():
+    if engine is None:
+        return None
+    pool = engine.pool
+    return {
+        'size': pool.size(),
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        'overflow': pool.overflow(),
+        'status': pool.status(),
+    }
+
+
+_query_context = threading.local()
+
+
+class QueryTicket:
+    # связывает задачу из GUI с соединениями, которые её поток взял из пула, чтобы выполняемый запрос можно было прервать
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections = set()
+        self.cancelled = False
+
+    def attach(self, dbapi_connection):
+        with self._lock:
+            self._connections.add(dbapi_connection)
+
+    def detach(self, dbapi_connection):
+        # ждёт отправки отмены: соединение не вернётся в пул и не достанется чужому запросу, пока она в пути
+        with self._lock:
+            self._connections.discard(dbapi_connection)
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+        # запрос отмены уходит по отдельному сокету из служебного потока, GUI-поток не ждёт сервер и пул
+        _cancel_executor.submit(self._cancel_connections)
+
+    def _cancel_connections(self):
+        with self._lock:
+            for dbapi_connection in self._connections:
+                try:
+                    dbapi_connection.cancel()
+                except Exception:
+                    # запрос продолжит выполняться: ошибка должна быть видна в журнале GUI
+                    logger.exception("Не удалось отменить запрос")
+
+
+_cancel_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='query-cancel')
+
+
+def set_query_ticket(ticket):
+    _query_context.ticket = ticket
+
+
+def current_query_ticket():
+    return getattr(_query_context, 'ticket', None)
+
+
+def _attach_ticket(dbapi_connection, connection_record, connection_proxy):
+    # соединение выдаётся пулом в потоке задачи, поэтому билет берётся из её контекста
+    ticket = current_query_ticket()
+    if ticket is not None:
+        ticket.attach(dbapi_connection)
+        connection_record.info['query_ticket'] = (ticket, dbapi_connection)
+
+
+def _detach_ticket(dbapi_connection, connection_record):
+    # при инвалидации dbapi_connection приходит как None, поэтому соединение берётся из записи
+    attached = connection_record.info.pop('query_ticket', None) if connection_record is not None else None
+    if attached is not None:
+        ticket, attached_connection = attached
+        ticket.detach(attached_connection)
+
+
 def perform_recreate_tables():
     try:
         metadata = Base.metadata
         metadata.drop_all(bind=engine)
         metadata.create_all(bind=engine)
+        cache.clear()
+        # create_all строит актуальную схему, поэтому все миграции считаются применёнными
+        from db.migrations import stamp
+        stamp()
         print("drop_all и create_all выполнены успешно.")
         return True
     except Exception as exc:
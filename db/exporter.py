@@ -0,0 +1,60 @@
+import csv
+import json
+from datetime import datetime
+
+from db.models import AttackTypeEnum
+from db.requests import with_session, select_images_filtered
+
+EXPORT_BATCH_SIZE = 10000
+
+
+def _plain_value(value):
+    if isinstance(value, AttackTypeEnum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return value
+
+
+def _csv_writer(f, columns):
+    writer = csv.writer(f)
+    writer.writerow(columns)
+
+    def write(rows):
+        writer.writerows(
+            [json.dumps(value) if isinstance(value, list) else _plain_value(value) for value in row]
+            for row in rows
+        )
+    return write
+
+
+def _jsonl_writer(f, columns):
+    def write(rows):
+        f.writelines(
+            json.dumps(dict(zip(columns, map(_plain_value, row))), ensure_ascii=False) + "\n"
+            for row in rows
+        )
+    return write
+
+
+WRITERS = {
+    'csv': _csv_writer,
+    'jsonl': _jsonl_writer,
+}
+
+
+@with_session()
+def export_images(filters, path, fmt='csv', batch_size=EXPORT_BATCH_SIZE, progress=None, *, session):
+    if fmt not in WRITERS:
+        raise ValueError(f"неизвестный формат экспорта: {fmt}")
+    # yield_per включает серверный курсор: строки приходят пакетами и не копятся в памяти
+    result = session.execute(select_images_filtered(filters).execution_options(yield_per=batch_size))
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        write = WRITERS[fmt](f, list(result.keys()))
+        for rows in result.partitions():
+            write(rows)
+            count += len(rows)
+            if progress is not None:
+                progress(count)
+    return count
@@ -0,0 +1,87 @@
+import argparse
+import hashlib
+import logging
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from db.config import settings
+from db.database import perform_connection, current_query_ticket
+from db.requests import get_images_without_hash, set_content_hashes
+
+logger = logging.getLogger(__name__)
+
+HASH_READ_SIZE = 1 << 20
+HASH_MAP_CHUNK = 16
+BACKFILL_BATCH_SIZE = 1000
+
+
+def hash_file(path, read_size=HASH_READ_SIZE):
+    # файл читается блоками, в памяти процесса не больше одного блока
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            while chunk := f.read(read_size):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def make_hash_pool(workers=None):
+    # spawn: пул может создаваться из потока GUI-процесса, где fork небезопасен
+    return ProcessPoolExecutor(workers or None, mp_context=multiprocessing.get_context('spawn'))
+
+
+def hash_files(pool, paths):
+    return list(pool.map(hash_file, paths, chunksize=HASH_MAP_CHUNK))
+
+
+def backfill_content_hashes(batch_size=BACKFILL_BATCH_SIZE, workers=None, progress=None):
+    # keyset по image_id: недоступные файлы остаются без хэша и не выбираются повторно
+    ticket = current_query_ticket()
+    after_id = 0
+    processed = hashed = missing = 0
+    pool = make_hash_pool(workers)
+    try:
+        while True:
+            if ticket is not None and ticket.cancelled:
+                break
+            rows = get_images_without_hash(after_id, batch_size)
+            if not rows:
+                break
+            after_id = rows[-1].image_id
+            digests = hash_files(pool, [row.file_path for row in rows])
+            hashes = {row.image_id: digest for row, digest in zip(rows, digests) if digest is not None}
+            set_content_hashes(hashes)
+            processed += len(rows)
+            hashed += len(hashes)
+            missing += len(rows) - len(hashes)
+            logger.info(f"Обработано {processed} изображений, посчитано {hashed}, файлов не найдено {missing}")
+            if progress is not None:
+                progress(processed)
+    finally:
+        pool.shutdown(cancel_futures=True)
+    return {'processed': processed, 'hashed': hashed, 'missing': missing}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m db.hashing',
+                                     description="Заполнение content_hash для уже зарегистрированных изображений")
+    parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=None, help="процессов хэширования (по умолчанию по числу ядер)")
+    args = parser.parse_args(argv)
+
+    if not perform_connection(settings.model_dump()):
+        return 1
+    started = time.perf_counter()
+    result = backfill_content_hashes(args.batch_size, args.workers,
+                                     progress=lambda processed: print(f"Обработано {processed} изображений"))
+    print(f"Заполнение завершено за {time.perf_counter() - started:.1f} с: изображений {result['processed']}, "
+          f"посчитано {result['hashed']}, файлов не найдено {result['missing']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+import argparse
+import csv
+import json
+import os
+import re
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+
+from db.config import settings
+from db.database import perform_connection, current_query_ticket
+from db.hashing import make_hash_pool, hash_files
+from db.models import IMAGE_EXTENSIONS, AttackTypeEnum
+from db.requests import bulk_create_images, get_existing_file_paths, get_run_by_id
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 5000
+SCAN_WORKERS = 8
+
+
+# строка, которую не удалось разобрать, остаётся в потоке записью с parse_error: номера строк
+# и позиция чекпоинта не сдвигаются, а load_chunk сообщает об ошибке и пропускает строку
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        while True:
+            try:
+                yield next(reader)
+            except StopIteration:
+                return
+            except csv.Error as exc:
+                yield {'parse_error': f"некорректная строка CSV: {exc}"}
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError as exc:
+                    yield {'parse_error': f"некорректный JSON: {exc}"}
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+}
+
+
+def parse_coordinates(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, (list, tuple)):
+        return [int(v) for v in value]
+    parts = [p for p in re.split(r"[\s,\[\]{}()]+", str(value)) if p]
+    return [int(p) for p in parts] if parts else None
+
+
+def to_image_rows(records):
+    for record in records:
+        if not isinstance(record, dict):
+            yield {'parse_error': f"запись должна быть объектом: {str(record)[:100]}"}
+            continue
+        if 'parse_error' in record:
+            yield record
+            continue
+        try:
+            coordinates = parse_coordinates(record.get('coordinates'))
+        except (TypeError, ValueError):
+            yield {'parse_error': f"некорректные coordinates: {str(record.get('coordinates'))[:100]}"}
+            continue
+        yield {
+            'run_id': record.get('run_id'),
+            'file_path': record.get('file_path'),
+            'original_name': record.get('original_name') or None,
+            'attack_type': record.get('attack_type'),
+            'coordinates': coordinates,
+        }
+
+
+def chunked(rows, size):
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def load_checkpoint(path, manifest):
+    # состояние: сколько строк манифеста пройдено и какие диапазоны [начало, конец) откатились
+    if not os.path.exists(path):
+        return 0, []
+    with open(path, encoding='utf-8') as f:
+        state = json.load(f)
+    if state.get('manifest') != os.path.abspath(manifest):
+        return 0, []
+    return int(state.get('rows', 0)), [tuple(r) for r in state.get('rejected', [])]
+
+
+def save_checkpoint(path, manifest, rows, rejected=()):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'manifest': os.path.abspath(manifest), 'rows': rows, 'rejected': [list(r) for r in rejected]}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_chunk(start, rows, pool):
+    # повтор пути внутри пакета нарушил бы уникальность file_path и откатил весь пакет:
+    # загружается первое вхождение, остальные считаются ошибками своих строк
+    numbered, invalid, first_rows = [], 0, {}
+    for number, row in enumerate(rows, start=start):
+        error = row.get('parse_error')
+        if error is None and row['file_path'] in first_rows:
+            error = f"file_path {row['file_path']} уже есть в строке {first_rows[row['file_path']]}"
+        if error is not None:
+            logger.error(f"images[{number}]: {error}")
+            invalid += 1
+            continue
+        if row['file_path']:
+            first_rows[row['file_path']] = number
+        numbered.append((number, row))
+    # пути, которые уже в базе (в том числе записанные перед сбоем до сохранения чекпоинта), не копируются повторно
+    existing = get_existing_file_paths([row['file_path'] for _, row in numbered if row['file_path']])
+    new = [(number, row) for number, row in numbered if row['file_path'] not in existing]
+    skipped = len(numbered) - len(new)
+    if not new:
+        return {'inserted': 0, 'failed': invalid, 'skipped': skipped, 'committed': True}
+    # хэши считаются до вставки, как при регистрации папки; недоступный файл остаётся без хэша
+    paths = [row['file_path'] for _, row in new if row['file_path'] and isinstance(row['file_path'], str)]
+    hashes = dict(zip(paths, hash_files(pool, paths)))
+    for _, row in new:
+        row['content_hash'] = hashes.get(row['file_path'])
+    report = bulk_create_images([row for _, row in new], batch_size=len(new),
+                                row_numbers=[number for number, _ in new])
+    inserted = sum(batch['inserted'] for batch in report)
+    # ошибка без индекса означает, что пакет откатился целиком
+    committed = not any(error['index'] is None for batch in report for error in batch['errors'])
+    return {'inserted': inserted, 'failed': invalid + len(new) - inserted, 'skipped': skipped,
+            'committed': committed}
+
+
+def import_manifest(manifest, fmt=None, chunk_size=CHUNK_SIZE, checkpoint=None, resume=True, hash_workers=None):
+    fmt = fmt or os.path.splitext(manifest)[1].lstrip('.').lower()
+    if fmt not in READERS:
+        raise ValueError(f"неизвестный формат манифеста: {fmt}")
+    checkpoint = checkpoint or manifest + '.checkpoint'
+
+    done, retry = load_checkpoint(checkpoint, manifest) if resume else (0, [])
+    if done:
+        print(f"Продолжение импорта с строки {done}")
+
+    totals = {'inserted': 0, 'failed': 0, 'skipped': 0}
+    rejected = []
+    processed = 0
+    started = time.perf_counter()
+
+    def load(start, chunk):
+        result = load_chunk(start, chunk, pool)
+        for key in totals:
+            totals[key] += result[key]
+        if not result['committed']:
+            rejected.append((start, start + len(chunk)))
+            print(f"Строки {start}-{start + len(chunk) - 1} не загружены, будут повторены при следующем запуске")
+
+    pool = make_hash_pool(hash_workers)
+    try:
+        # сначала повторяются диапазоны, откатившиеся в прошлых запусках
+        for range_start, range_end in retry:
+            rows = islice(to_image_rows(READERS[fmt](manifest)), range_start, range_end)
+            for number, chunk in enumerate(chunked(rows, chunk_size)):
+                load(range_start + number * chunk_size, chunk)
+        if retry:
+            save_checkpoint(checkpoint, manifest, done, rejected)
+
+        rows = islice(to_image_rows(READERS[fmt](manifest)), done, None)
+        for chunk in chunked(rows, chunk_size):
+            load(done, chunk)
+            processed += len(chunk)
+            done += len(chunk)
+            save_checkpoint(checkpoint, manifest, done, rejected)
+
+            elapsed = time.perf_counter() - started
+            print(f"Обработано {done} строк, добавлено {totals['inserted']}, уже были {totals['skipped']}, "
+                  f"ошибок {totals['failed']}, {processed / elapsed if elapsed else 0:.0f} строк/с")
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+    if not rejected and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return {'rows': done, **totals, 'rejected': rejected}
+
+
+def scan_directory(root, extensions=IMAGE_EXTENSIONS, workers=SCAN_WORKERS):
+    # каталоги читаются параллельно: на сетевых дисках scandir упирается в задержки, а не в CPU.
+    # пути отдаются по мере нахождения, в том же виде со '/', что и из диалога выбора файла
+    def scan(path):
+        files, dirs = [], []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            dirs.append(entry.path)
+                        # регистр как в file_ext и фильтре по типу файла: .JPG не попадёт в фильтр .jpg
+                        elif entry.is_file() and entry.name.endswith(extensions):
+                            files.append(entry.path.replace(os.sep, '/'))
+                    except OSError:
+                        continue
+        except OSError as exc:
+            logger.error(f"{path}: {exc}")
+        return files, dirs
+
+    executor = ThreadPoolExecutor(workers)
+    try:
+        pending = {executor.submit(scan, os.path.abspath(root))}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, dirs = future.result()
+                pending.update(executor.submit(scan, path) for path in dirs)
+                yield from files
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def import_directory(root, run_id, attack_type, chunk_size=CHUNK_SIZE, workers=SCAN_WORKERS, progress=None,
+                     hash_workers=None):
+    if not os.path.isdir(root):
+        raise ValueError(f"каталог не найден: {root}")
+    if get_run_by_id(run_id) is None:
+        raise ValueError(f"Run с id={run_id} не найден")
+    attack_type = AttackTypeEnum(attack_type)
+
+    # отмена из GUI прерывает обход между пакетами; записанные пакеты остаются,
+    # повторный запуск пропустит их как уже зарегистрированные
+    ticket = current_query_ticket()
+    found = inserted = skipped = failed = 0
+    pool = make_hash_pool(hash_workers)
+    try:
+        for chunk in chunked(scan_directory(root, workers=workers), chunk_size):
+            if ticket is not None and ticket.cancelled:
+                break
+            found += len(chunk)
+            existing = get_existing_file_paths(chunk)
+            paths = [path for path in chunk if path not in existing]
+            skipped += len(chunk) - len(paths)
+            if paths:
+                # хэши новых файлов считаются в пуле процессов до вставки, чтобы дубликаты сразу были видны
+                rows = [{'run_id': run_id, 'file_path': path, 'original_name': os.path.basename(path),
+                         'attack_type': attack_type, 'content_hash': content_hash}
+                        for path, content_hash in zip(paths, hash_files(pool, paths))]
+                added = sum(batch['inserted'] for batch in bulk_create_images(rows, batch_size=len(rows)))
+                inserted += added
+                failed += len(rows) - added
+            logger.info(f"Найдено {found} файлов, добавлено {inserted}, уже были {skipped}, ошибок {failed}")
+            if progress is not None:
+                progress(found)
+    finally:
+        pool.shutdown(cancel_futures=True)
+    return {'found': found, 'inserted': inserted, 'skipped': skipped, 'failed': failed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m db.importer',
+                                     description="Потоковый импорт изображений из CSV/JSONL манифеста или каталога")
+    parser.add_argument('manifest', help="манифест или каталог с изображениями")
+    parser.add_argument('--format', choices=sorted(READERS), default=None)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--checkpoint', default=None)
+    parser.add_argument('--no-resume', action='store_true')
+    parser.add_argument('--run-id', type=int, default=None, help="прогон для файлов каталога")
+    parser.add_argument('--attack-type', choices=[a.value for a in AttackTypeEnum], default=None,
+                        help="тип атаки для файлов каталога")
+    parser.add_argument('--workers', type=int, default=SCAN_WORKERS, help="потоков обхода каталога")
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.manifest) and (args.run_id is None or args.attack_type is None):
+        parser.error("для каталога нужны --run-id и --attack-type")
+    if not perform_connection(settings.model_dump()):
+        return 1
+    if os.path.isdir(args.manifest):
+        result = import_directory(args.manifest, args.run_id, args.attack_type, chunk_size=args.chunk_size,
+                                  workers=args.workers, progress=lambda found: print(f"Найдено {found} файлов"))
+        print(f"Регистрация завершена: файлов {result['found']}, добавлено {result['inserted']}, "
+              f"уже были {result['skipped']}, ошибок {result['failed']}")
+        return 0 if not result['failed'] else 2
+    result = import_manifest(args.manifest, fmt=args.format, chunk_size=args.chunk_size,
+                             checkpoint=args.checkpoint, resume=not args.no_resume)
+    print(f"Импорт завершён: строк {result['rows']}, добавлено {result['inserted']}, "
+          f"уже были {result['skipped']}, ошибок {result['failed']}")
+    if result['rejected']:
+        print("Не загружены диапазоны строк (повторный запуск попробует их снова): "
+              + ", ".join(f"{start}-{end - 1}" for start, end in result['rejected']))
+    return 0 if not result['failed'] else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import importlib
+import pkgutil
+import time
+
+from sqlalchemy import text
+
+import db.database
+from db.migrations import versions
+
+MIGRATIONS_TABLE = "schema_migrations"
+
+
+def load_migrations():
+    migrations = []
+    for module_info in pkgutil.iter_modules(versions.__path__):
+        module = importlib.import_module(f"{versions.__name__}.{module_info.name}")
+        migrations.append(module)
+    migrations.sort(key=lambda m: m.revision)
+    return migrations
+
+
+def _autocommit_connection():
+    return db.database.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+
+
+def _ensure_table(conn):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ("
+        "revision INTEGER PRIMARY KEY, "
+        "description TEXT, "
+        "applied_at TIMESTAMP NOT NULL DEFAULT NOW())"
+    ))
+
+
+def get_applied_revisions():
+    with _autocommit_connection() as conn:
+        _ensure_table(conn)
+        return set(conn.execute(text(f"SELECT revision FROM {MIGRATIONS_TABLE}")).scalars())
+
+
+def _record(conn, migration):
+    conn.execute(text(f"INSERT INTO {MIGRATIONS_TABLE} (revision, description) VALUES (:revision, :description)"),
+                 {'revision': migration.revision, 'description': migration.description})
+
+
+def _forget(conn, migration):
+    conn.execute(text(f"DELETE FROM {MIGRATIONS_TABLE} WHERE revision = :revision"),
+                 {'revision': migration.revision})
+
+
+def _run(migration, step):
+    # миграции с CREATE INDEX CONCURRENTLY и пакетным заполнением идут вне транзакции
+    # и должны быть идемпотентны, остальные выполняются целиком в одной транзакции
+    if getattr(migration, 'transactional', True):
+        with db.database.engine.begin() as conn:
+            getattr(migration, step)(conn)
+            (_record if step == 'upgrade' else _forget)(conn, migration)
+    else:
+        with _autocommit_connection() as conn:
+            getattr(migration, step)(conn)
+            (_record if step == 'upgrade' else _forget)(conn, migration)
+
+
+def upgrade(target=None):
+    applied = get_applied_revisions()
+    done = []
+    for migration in load_migrations():
+        if target is not None and migration.revision > target:
+            break
+        if migration.revision in applied:
+            continue
+        print(f"upgrade {migration.revision:04d}: {migration.description}")
+        started = time.perf_counter()
+        _run(migration, 'upgrade')
+        print(f"  выполнено за {time.perf_counter() - started:.1f} с")
+        done.append(migration.revision)
+    return done
+
+
+def downgrade(target=None):
+    applied = get_applied_revisions()
+    candidates = [m for m in reversed(load_migrations()) if m.revision in applied]
+    if target is None:
+        candidates = candidates[:1]
+    else:
+        candidates = [m for m in candidates if m.revision > target]
+    done = []
+    for migration in candidates:
+        print(f"downgrade {migration.revision:04d}: {migration.description}")
+        _run(migration, 'downgrade')
+        done.append(migration.revision)
+    return done
+
+
+def stamp():
+    with db.database.engine.begin() as conn:
+        _ensure_table(conn)
+        conn.execute(text(f"DELETE FROM {MIGRATIONS_TABLE}"))
+        for migration in load_migrations():
+            _record(conn, migration)
+
+
+def status():
+    applied = get_applied_revisions()
+    return [(m.revision, m.description, m.revision in applied) for m in load_migrations()]
+
+
+def perform_upgrade():
+    try:
+        done = upgrade()
+        print(f"миграции применены: {len(done)}")
+        return True
+    except Exception as exc:
+        print("ошибка при применении миграций:", exc)
+        return False
+
+
+def create_index_concurrently(conn, name, ddl):
+    # прерванный CREATE INDEX CONCURRENTLY оставляет невалидный индекс, IF NOT EXISTS его бы пропустил
+    invalid = conn.execute(text(
+        "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"
+    ), {'name': name}).first()
+    if invalid:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    conn.execute(text(ddl))
+
+
+def drop_index_concurrently(conn, name):
+    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+def backfill(conn, table, key, assignment, where, batch_size=10000, pause=0.0):
+    # каждый пакет коммитится отдельно, блокировки строк держатся только на время одного UPDATE
+    statement = text(
+        f"WITH batch AS (SELECT {key} FROM {table} WHERE {key} > :last AND ({where}) "
+        f"ORDER BY {key} LIMIT :batch_size) "
+        f"UPDATE {table} SET {assignment} FROM batch WHERE {table}.{key} = batch.{key} "
+        f"RETURNING {table}.{key}"
+    )
+    last, total = 0, 0
+    while True:
+        keys = conn.execute(statement, {'last': last, 'batch_size': batch_size}).scalars().all()
+        if not keys:
+            return total
+        last = max(keys)
+        total += len(keys)
+        print(f"  {table}: обновлено {total} строк")
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,36 @@
+import argparse
+import sys
+
+from db.config import settings
+from db.database import perform_connection
+from db.migrations import upgrade, downgrade, stamp, status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m db.migrations', description="Миграции схемы базы данных")
+    commands = parser.add_subparsers(dest='command', required=True)
+    upgrade_parser = commands.add_parser('upgrade')
+    upgrade_parser.add_argument('target', type=int, nargs='?', default=None)
+    downgrade_parser = commands.add_parser('downgrade')
+    downgrade_parser.add_argument('target', type=int, nargs='?', default=None)
+    commands.add_parser('stamp')
+    commands.add_parser('status')
+    args = parser.parse_args(argv)
+
+    if not perform_connection(settings.model_dump()):
+        return 1
+
+    if args.command == 'upgrade':
+        upgrade(args.target)
+    elif args.command == 'downgrade':
+        downgrade(args.target)
+    elif args.command == 'stamp':
+        stamp()
+    else:
+        for revision, description, applied in status():
+            print(f"{revision:04d} [{'x' if applied else ' '}] {description}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
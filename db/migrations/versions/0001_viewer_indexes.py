@@ -0,0 +1,24 @@
+from db.migrations import create_index_concurrently, drop_index_concurrently
+
+revision = 1
+description = "индексы для фильтров и соединений просмотра изображений"
+transactional = False
+
+INDEXES = (
+    ("ix_runs_experiment_id", "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_runs_experiment_id ON runs (experiment_id)"),
+    ("ix_images_run_id", "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_images_run_id ON images (run_id)"),
+    ("ix_images_attack_type",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_images_attack_type ON images (attack_type)"),
+    ("ix_images_file_ext",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_images_file_ext ON images (SUBSTRING(file_path FROM '[.][^./]*$'))"),
+)
+
+
+def upgrade(conn):
+    for name, ddl in INDEXES:
+        create_index_concurrently(conn, name, ddl)
+
+
+def downgrade(conn):
+    for name, _ in reversed(INDEXES):
+        drop_index_concurrently(conn, name)
@@ -0,0 +1,23 @@
+from sqlalchemy import text
+
+revision = 2
+description = "сводная таблица image_rollups для статистики"
+
+
+def upgrade(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS image_rollups ("
+        "run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE, "
+        "attack_type attack_type_enum NOT NULL, "
+        "image_count INTEGER NOT NULL DEFAULT 0, "
+        "PRIMARY KEY (run_id, attack_type))"
+    ))
+    conn.execute(text("DELETE FROM image_rollups"))
+    conn.execute(text(
+        "INSERT INTO image_rollups (run_id, attack_type, image_count) "
+        "SELECT run_id, attack_type, COUNT(*) FROM images GROUP BY run_id, attack_type"
+    ))
+
+
+def downgrade(conn):
+    conn.execute(text("DROP TABLE IF EXISTS image_rollups"))
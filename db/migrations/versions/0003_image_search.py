@@ -0,0 +1,27 @@
+from sqlalchemy import text
+
+from db.migrations import create_index_concurrently, drop_index_concurrently
+
+revision = 3
+description = "триграммные индексы для поиска по пути и имени изображения"
+transactional = False
+
+INDEXES = (
+    ("ix_images_file_path_trgm",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_images_file_path_trgm ON images USING gin (file_path gin_trgm_ops)"),
+    ("ix_images_original_name_trgm",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_images_original_name_trgm "
+     "ON images USING gin (original_name gin_trgm_ops)"),
+)
+
+
+def upgrade(conn):
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    for name, ddl in INDEXES:
+        create_index_concurrently(conn, name, ddl)
+
+
+def downgrade(conn):
+    # расширение pg_trgm оставляется: им могут пользоваться другие объекты базы
+    for name, _ in reversed(INDEXES):
+        drop_index_concurrently(conn, name)
@@ -0,0 +1,48 @@
+from sqlalchemy import text
+
+from db.migrations import create_index_concurrently, drop_index_concurrently, backfill
+
+revision = 4
+description = "колонка bbox с GiST-индексом для пространственных фильтров"
+transactional = False
+
+INDEXES = (
+    ("ix_images_bbox", "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_images_bbox ON images USING gist (bbox)"),
+    ("ix_images_bbox_area", "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_images_bbox_area ON images (area(bbox))"),
+)
+
+
+def upgrade(conn):
+    conn.execute(text(
+        "CREATE OR REPLACE FUNCTION images_bbox(coords integer[]) RETURNS box AS $$ "
+        "SELECT CASE WHEN array_length(coords, 1) = 4 THEN "
+        "box(point(coords[1] - coords[3] / 2.0, coords[2] - coords[4] / 2.0), "
+        "point(coords[1] + coords[3] / 2.0, coords[2] + coords[4] / 2.0)) END "
+        "$$ LANGUAGE sql IMMUTABLE"
+    ))
+    conn.execute(text(
+        "CREATE OR REPLACE FUNCTION images_set_bbox() RETURNS trigger AS $$ "
+        "BEGIN NEW.bbox := images_bbox(NEW.coordinates); RETURN NEW; END "
+        "$$ LANGUAGE plpgsql"
+    ))
+    # колонка без значения по умолчанию добавляется без перезаписи таблицы
+    conn.execute(text("ALTER TABLE images ADD COLUMN IF NOT EXISTS bbox box"))
+    # триггер ставится до заполнения, чтобы строки, записанные во время backfill, тоже получили рамку
+    conn.execute(text("DROP TRIGGER IF EXISTS images_set_bbox ON images"))
+    conn.execute(text(
+        "CREATE TRIGGER images_set_bbox BEFORE INSERT OR UPDATE OF coordinates ON images "
+        "FOR EACH ROW EXECUTE FUNCTION images_set_bbox()"
+    ))
+    backfill(conn, 'images', 'image_id', "bbox = images_bbox(coordinates)",
+             "bbox IS NULL AND coordinates IS NOT NULL")
+    for name, ddl in INDEXES:
+        create_index_concurrently(conn, name, ddl)
+
+
+def downgrade(conn):
+    for name, _ in reversed(INDEXES):
+        drop_index_concurrently(conn, name)
+    conn.execute(text("DROP TRIGGER IF EXISTS images_set_bbox ON images"))
+    conn.execute(text("ALTER TABLE images DROP COLUMN IF EXISTS bbox"))
+    conn.execute(text("DROP FUNCTION IF EXISTS images_set_bbox()"))
+    conn.execute(text("DROP FUNCTION IF EXISTS images_bbox(integer[])"))
@@ -0,0 +1,26 @@
+from sqlalchemy import text
+
+from db.migrations import create_index_concurrently, drop_index_concurrently
+
+revision = 5
+description = "колонка content_hash с индексом для поиска дубликатов"
+transactional = False
+
+INDEXES = (
+    ("ix_images_content_hash",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_images_content_hash ON images (content_hash)"),
+)
+
+
+def upgrade(conn):
+    # колонка без значения по умолчанию добавляется без перезаписи таблицы;
+    # хэши считаются по файлам, поэтому заполнение идёт отдельно: python -m db.hashing
+    conn.execute(text("ALTER TABLE images ADD COLUMN IF NOT EXISTS content_hash varchar(64)"))
+    for name, ddl in INDEXES:
+        create_index_concurrently(conn, name, ddl)
+
+
+def downgrade(conn):
+    for name, _ in reversed(INDEXES):
+        drop_index_concurrently(conn, name)
+    conn.execute(text("ALTER TABLE images DROP COLUMN IF EXISTS content_hash"))
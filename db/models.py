@@ -1,11 +1,41 @@
+import re
 from datetime import date, datetime
 from typing import Optional, List
 
-from sqlalchemy import Integer, String, Date, Text, func, TIMESTAMP, ForeignKey, JSON, Float, Enum, ARRAY, Boolean, text
+from sqlalchemy import Integer, String, Date, Text, func, TIMESTAMP, ForeignKey, JSON, Float, Enum, ARRAY, Boolean, text, \
+    Index, literal_column, event, DDL, FetchedValue
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.types import UserDefinedType
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 import enum
 from db.database import Base
 
+FILE_EXT_PATTERN = "[.][^./]*$"
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+class Box(UserDefinedType):
+    # геометрический тип PostgreSQL box с операторами, которые обслуживает GiST-индекс
+    cache_ok = True
+
+    def get_col_spec(self, **kw):
+        return "BOX"
+
+    class comparator_factory(UserDefinedType.Comparator):
+        def overlaps(self, other):
+            return self.op('&&', return_type=Boolean)(other)
+
+        def contained_by(self, other):
+            return self.op('<@', return_type=Boolean)(other)
+
+        def contains(self, other, **kw):
+            return self.op('@>', return_type=Boolean)(other)
+
+
+def make_box(x1, y1, x2, y2):
+    return func.box(func.point(x1, y1), func.point(x2, y2), type_=Box)
+
+
 class AttackTypeEnum(str, enum.Enum):
     no_attack = "no_attack"
     blur = "blur"
@@ -13,6 +43,9 @@ class AttackTypeEnum(str, enum.Enum):
     adversarial = "adversarial"
     other = "other"
 
+attack_type_enum = Enum(AttackTypeEnum, name="attack_type_enum")
+
+
 class Experiment(Base):
     __tablename__ = "experiments"
 
@@ -28,7 +61,7 @@ class Run(Base):
     __tablename__ = "runs"
 
     run_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    experiment_id: Mapped[int] = mapped_column(ForeignKey("experiments.experiment_id", ondelete="CASCADE"))
+    experiment_id: Mapped[int] = mapped_column(ForeignKey("experiments.experiment_id", ondelete="CASCADE"), index=True)
     run_date: Mapped[datetime] = mapped_column(TIMESTAMP, server_default=func.now())
 
     accuracy: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
@@ -42,13 +75,79 @@ class Image(Base):
     __tablename__ = "images"
 
     image_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    run_id: Mapped[int] = mapped_column(ForeignKey("runs.run_id", ondelete="CASCADE"))
+    run_id: Mapped[int] = mapped_column(ForeignKey("runs.run_id", ondelete="CASCADE"), index=True)
     file_path: Mapped[str] = mapped_column(String(500), nullable=False, unique=True)
     original_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
 
-    attack_type: Mapped[AttackTypeEnum] = mapped_column(Enum(AttackTypeEnum, name="attack_type_enum"), nullable=False)
+    attack_type: Mapped[AttackTypeEnum] = mapped_column(attack_type_enum, nullable=False, index=True)
     added_date: Mapped[datetime] = mapped_column(TIMESTAMP, server_default=text("DATE_TRUNC('second', NOW()::timestamp)"))
 
     coordinates: Mapped[Optional[List[int]]] = mapped_column(ARRAY(Integer, dimensions=1), nullable=True)
+    # рамка из coordinates (центр x, центр y, ширина, высота), заполняется триггером images_set_bbox
+    bbox = mapped_column(Box, nullable=True, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    # sha256 содержимого файла в hex: считается при регистрации папки и фоновым заполнением db.hashing
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
 
     run: Mapped["Run"] = relationship("Run", back_populates="images")
+
+    # расширение вычисляется тем же выражением, что и в индексе ix_images_file_ext,
+    # поэтому фильтр по типу файла идёт по индексу, а не полным LIKE '%.png'
+    @hybrid_property
+    def file_ext(self):
+        match = re.search(FILE_EXT_PATTERN, self.file_path)
+        return match.group(0) if match else None
+
+    @file_ext.expression
+    def file_ext(cls):
+        return func.substring(cls.file_path, literal_column(f"'{FILE_EXT_PATTERN}'"))
+
+    @hybrid_property
+    def bbox_area(self):
+        if not self.coordinates or len(self.coordinates) != 4:
+            return None
+        return float(self.coordinates[2] * self.coordinates[3])
+
+    @bbox_area.expression
+    def bbox_area(cls):
+        return func.area(cls.bbox)
+
+
+Index("ix_images_file_ext", Image.file_ext)
+
+# триграммные GIN-индексы для поиска подстроки (ILIKE '%...%') и префикса пути по имени и пути файла
+Index("ix_images_file_path_trgm", Image.file_path,
+      postgresql_using="gin", postgresql_ops={"file_path": "gin_trgm_ops"})
+Index("ix_images_original_name_trgm", Image.original_name,
+      postgresql_using="gin", postgresql_ops={"original_name": "gin_trgm_ops"})
+event.listen(Image.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+Index("ix_images_content_hash", Image.content_hash)
+
+Index("ix_images_bbox", Image.bbox, postgresql_using="gist")
+Index("ix_images_bbox_area", Image.bbox_area)
+event.listen(Image.__table__, "after_create", DDL(
+    "CREATE OR REPLACE FUNCTION images_bbox(coords integer[]) RETURNS box AS $$ "
+    "SELECT CASE WHEN array_length(coords, 1) = 4 THEN "
+    "box(point(coords[1] - coords[3] / 2.0, coords[2] - coords[4] / 2.0), "
+    "point(coords[1] + coords[3] / 2.0, coords[2] + coords[4] / 2.0)) END "
+    "$$ LANGUAGE sql IMMUTABLE"
+))
+event.listen(Image.__table__, "after_create", DDL(
+    "CREATE OR REPLACE FUNCTION images_set_bbox() RETURNS trigger AS $$ "
+    "BEGIN NEW.bbox := images_bbox(NEW.coordinates); RETURN NEW; END "
+    "$$ LANGUAGE plpgsql"
+))
+event.listen(Image.__table__, "after_create", DDL(
+    "CREATE TRIGGER images_set_bbox BEFORE INSERT OR UPDATE OF coordinates ON images "
+    "FOR EACH ROW EXECUTE FUNCTION images_set_bbox()"
+))
+
+
+# сводка по изображениям, поддерживается инкрементально функциями записи в db.requests,
+# чтобы статистика считалась по числу групп, а не по всей таблице images
+class ImageRollup(Base):
+    __tablename__ = "image_rollups"
+
+    run_id: Mapped[int] = mapped_column(ForeignKey("runs.run_id", ondelete="CASCADE"), primary_key=True)
+    attack_type: Mapped[AttackTypeEnum] = mapped_column(attack_type_enum, primary_key=True)
+    image_count: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
@@ -0,0 +1,140 @@
+import logging
+import re
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event
+
+from db.config import settings
+
+slow_logger = logging.getLogger('db.slow')
+
+SAMPLE_SIZE = 1000
+SLOWEST_SIZE = 20
+
+# EXPLAIN ANALYZE выполняет запрос, поэтому повторять можно только чтение без побочных эффектов
+_LEADING_COMMENTS = re.compile(r"^\s*(?:(?:--[^\n]*\n|/\*.*?\*/)\s*)*", re.S)
+_NOT_READ_ONLY = re.compile(
+    r"\b(?:insert|update|delete|merge|truncate|into|for\s+(?:no\s+key\s+)?(?:update|share|key\s+share)"
+    r"|nextval|setval|pg_cancel_backend|pg_terminate_backend|pg_advisory\w*|set_config|pg_notify|dblink\w*)\b",
+    re.I)
+
+
+def is_read_only(statement):
+    statement = _LEADING_COMMENTS.sub('', statement)
+    return statement[:6].lower() == 'select' and not _NOT_READ_ONLY.search(statement)
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, round(fraction * (len(values) - 1)))]
+
+
+class QueryStats:
+    # время вызовов функций db.requests и отдельных SQL-запросов; перцентили считаются
+    # по последним SAMPLE_SIZE замерам каждого ключа
+    def __init__(self, slow_ms=settings.DB_SLOW_QUERY_MS):
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._slowest = {}
+
+    def record(self, kind, name, duration, rows=None):
+        ms = duration * 1000
+        with self._lock:
+            entry = self._entries.get((kind, name))
+            if entry is None:
+                entry = self._entries[(kind, name)] = {
+                    'count': 0, 'rows': 0, 'max': 0.0, 'samples': deque(maxlen=SAMPLE_SIZE)
+                }
+            entry['count'] += 1
+            entry['max'] = max(entry['max'], ms)
+            entry['samples'].append(ms)
+            if rows is not None and rows >= 0:
+                entry['rows'] += rows
+        if self.slow_ms and ms >= self.slow_ms:
+            what = "запрос" if kind == 'statement' else "вызов"
+            slow_logger.warning(f"медленный {what} ({ms:.0f} мс): {name[:300]}")
+        return ms
+
+    def record_call(self, name, duration, result):
+        self.record('function', name, duration, len(result) if isinstance(result, list) else None)
+
+    def record_statement(self, statement, parameters, duration, rows, explainable):
+        name = ' '.join(statement.split())
+        ms = self.record('statement', name, duration, rows)
+        with self._lock:
+            current = self._slowest.get(name)
+            if current is not None and current['duration_ms'] >= ms:
+                return
+            self._slowest[name] = {'statement': statement, 'parameters': parameters, 'duration_ms': ms,
+                                   'explainable': explainable}
+            if len(self._slowest) > SLOWEST_SIZE:
+                fastest = min(self._slowest, key=lambda key: self._slowest[key]['duration_ms'])
+                del self._slowest[fastest]
+
+    def summary(self):
+        with self._lock:
+            rows = []
+            for (kind, name), entry in self._entries.items():
+                samples = sorted(entry['samples'])
+                rows.append({
+                    'kind': kind,
+                    'name': name,
+                    'count': entry['count'],
+                    'p50_ms': _percentile(samples, 0.5),
+                    'p95_ms': _percentile(samples, 0.95),
+                    'max_ms': entry['max'],
+                    'rows': entry['rows'],
+                })
+        return sorted(rows, key=lambda row: row['p95_ms'], reverse=True)
+
+    def slowest(self, limit=None, explainable_only=False):
+        with self._lock:
+            statements = [dict(s) for s in self._slowest.values() if s['explainable'] or not explainable_only]
+        statements.sort(key=lambda s: s['duration_ms'], reverse=True)
+        return statements[:limit] if limit else statements
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self._slowest.clear()
+
+    def install(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['query_started'] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('query_started', None)
+        if started is None:
+            return
+        # EXPLAIN повторяет запрос через psycopg2, поэтому сохраняются только одиночные SELECT этого драйвера
+        explainable = not executemany and conn.dialect.driver == 'psycopg2' and is_read_only(statement)
+        self.record_statement(statement, parameters if explainable else None, time.perf_counter() - started,
+                              cursor.rowcount, explainable)
+
+
+def explain_statement(engine, statement, parameters):
+    # ANALYZE выполняет запрос на самом деле, поэтому транзакция только читающая и всегда откатывается
+    if not is_read_only(statement):
+        raise ValueError("EXPLAIN ANALYZE выполняется только для SELECT без побочных эффектов")
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SET TRANSACTION READ ONLY")
+            cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters)
+            return "\n".join(row[0] for row in cursor.fetchall())
+        finally:
+            cursor.close()
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+query_stats = QueryStats()
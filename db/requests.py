@@ -1,16 +1,27 @@
+import csv
+import io
+import logging
+import time
 from datetime import datetime, UTC, date
 from functools import wraps
 from typing import Optional, Any, List
 
 from pydantic import ValidationError
-from sqlalchemy import select, desc, text, asc
+from sqlalchemy import select, desc, text, asc, insert, func, literal_column, Integer, delete, case, or_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 import db.database
-from db.models import Experiment, Run, Image, AttackTypeEnum
+from db.cache import cached, invalidates
+from db.query_stats import query_stats, explain_statement
+from db.models import Experiment, Run, Image, AttackTypeEnum, ImageRollup, make_box
 from db.schemas import ExperimentCreate, RunCreate, ImageCreate, ImageEdit, RunEdit
 from sqlalchemy.exc import IntegrityError
 
 from test_data import experiments_data, runs_data, images_data
 
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 5000
+
 
 def with_session(commit = False):
     def decorator(func):
@@ -18,57 +29,248 @@ def with_session(commit = False):
         def wrapper(*args, **kwargs):
             with db.database.SessionLocal() as session:
                 kwargs['session'] = session
+                started = time.perf_counter()
                 result = func(*args, **kwargs)
                 if commit:
                     session.commit()
+                query_stats.record_call(func.__name__, time.perf_counter() - started, result)
                 return result
         return wrapper
     return decorator
 
+@invalidates(('experiment', 'list'))
 @with_session(commit=True)
 def create_experiment(name, description = None, *, session):
     ExperimentCreate(name=name, description=description, created_date=datetime.now().date())
     exp = Experiment(name=name, description=description, created_date=datetime.now().date())
     session.add(exp)
 
+@invalidates(('run', 'list'))
 @with_session(commit=True)
 def create_run(experiment_id, accuracy = None, flagged = None, *, session):
     RunCreate(experiment_id=experiment_id, run_date=datetime.now(UTC), accuracy=accuracy, flagged=flagged)
     if session.get(Experiment, experiment_id) is None :
         raise ValueError(f"Experiment с id={experiment_id} не найден")
 
-    run = Run(experiment_id=experiment_id, run_date=datetime.now(UTC), accuracy=accuracy, flagged=flagged)
+    run = Run(experiment_id=experiment_id, run_date=_naive_utc(datetime.now(UTC)), accuracy=accuracy, flagged=flagged)
     session.add(run)
 
+def _rollup_statements(deltas):
+    rows = [{'run_id': run_id, 'attack_type': AttackTypeEnum(attack_type), 'image_count': delta}
+            for (run_id, attack_type), delta in sorted(deltas.items()) if delta]
+    if not rows:
+        return []
+    stmt = pg_insert(ImageRollup).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ImageRollup.run_id, ImageRollup.attack_type],
+        set_={'image_count': ImageRollup.image_count + stmt.excluded.image_count}
+    )
+    if any(row['image_count'] < 0 for row in rows):
+        return [stmt, delete(ImageRollup).where(ImageRollup.image_count <= 0)]
+    return [stmt]
+
+def _bump_rollups(session, deltas):
+    for stmt in _rollup_statements(deltas):
+        session.execute(stmt)
+
+def _count_rollups(rows):
+    deltas = {}
+    for row in rows:
+        key = (row['run_id'], AttackTypeEnum(row['attack_type']))
+        deltas[key] = deltas.get(key, 0) + 1
+    return deltas
+
+@invalidates(('image', 'list'))
 @with_session(commit=True)
 def create_image(run_id, file_path, attack_type, original_name = None, added_date = None, coordinates = None, *, session):
-    ImageCreate(run_id=run_id, file_path=file_path, original_name=original_name, attack_type=attack_type,
-                added_date=added_date, coordinates=coordinates)
+    data = ImageCreate(run_id=run_id, file_path=file_path, original_name=original_name, attack_type=attack_type,
+                       added_date=added_date, coordinates=coordinates)
     if session.get(Run, run_id) is None:
         raise ValueError(f"Run с id={run_id} не найден")
-    img = Image(run_id=run_id, file_path=file_path, original_name=original_name, attack_type=attack_type, added_date=added_date, coordinates=coordinates)
+    img = Image(run_id=run_id, file_path=file_path, original_name=original_name, attack_type=attack_type,
+                added_date=_naive_utc(added_date), coordinates=coordinates)
     session.add(img)
+    _bump_rollups(session, {(data.run_id, data.attack_type): 1})
+
+@invalidates(('image', 'list'))
+@with_session(commit=True)
+def refresh_image_rollups(*, session):
+    session.execute(delete(ImageRollup))
+    session.execute(insert(ImageRollup).from_select(
+        ['run_id', 'attack_type', 'image_count'],
+        select(Image.run_id, Image.attack_type, func.count()).group_by(Image.run_id, Image.attack_type)
+    ))
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _validate_batch(batch, offset, schema, defaults):
+    valid, errors = [], []
+    for i, data in enumerate(batch, start=offset):
+        try:
+            row = schema(**{**defaults, **data}).model_dump(exclude_unset=True)
+        except ValidationError as e:
+            errors.append({'index': i, 'error': str(e)})
+            continue
+        valid.append((i, row))
+    return valid, errors
+
+def _parent_ids_query(valid, key, parent_column):
+    return select(parent_column).where(parent_column.in_({row[key] for _, row in valid}))
+
+def _check_parents(session, valid, errors, key, parent_column, parent_name):
+    existing = set(session.scalars(_parent_ids_query(valid, key, parent_column)))
+    return _split_by_parents(valid, errors, existing, key, parent_name)
+
+def _split_by_parents(valid, errors, existing, key, parent_name):
+    checked = []
+    for i, row in valid:
+        if row[key] in existing:
+            checked.append((i, row))
+        else:
+            errors.append({'index': i, 'error': f"{parent_name} с id={row[key]} не найден"})
+    return checked
+
+def _group_by_columns(rows, columns):
+    # колонки с None не передаются, чтобы сработали server_default
+    groups = {}
+    for row in rows:
+        values = {column: row[column] for column in columns if row.get(column) is not None}
+        groups.setdefault(tuple(values), []).append(values)
+    return groups
+
+def _naive_utc(value):
+    # колонки TIMESTAMP без зоны хранят UTC (схемы так же трактуют наивные даты);
+    # одно преобразование для ORM, INSERT и COPY, не зависящее от зоны клиента и сервера
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(UTC).replace(tzinfo=None)
+    return value
+
+def _insert_rows(session, model, rows, columns):
+    for group in _group_by_columns(rows, columns).values():
+        session.execute(insert(model), [{column: _naive_utc(value) for column, value in values.items()}
+                                        for values in group])
+
+def _copy_value(value):
+    if value is None:
+        return None
+    if isinstance(value, AttackTypeEnum):
+        return value.name
+    if isinstance(value, datetime):
+        return _naive_utc(value).isoformat(sep=' ')
+    if isinstance(value, list):
+        return "{" + ",".join(str(v) for v in value) + "}"
+    return value
+
+def _copy_rows(session, model, rows, columns):
+    cursor = session.connection().connection.dbapi_connection.cursor()
+    try:
+        for group_columns, group in _group_by_columns(rows, columns).items():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for values in group:
+                writer.writerow([_copy_value(values[column]) for column in group_columns])
+            buffer.seek(0)
+            cursor.copy_expert(
+                f"COPY {model.__tablename__} ({', '.join(group_columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+    finally:
+        cursor.close()
 
+def _renumber_errors(errors, row_numbers):
+    # индексы ошибок считаются от начала переданного списка, row_numbers переводит их в номера строк источника
+    if row_numbers is not None:
+        for error in errors:
+            if error['index'] is not None:
+                error['index'] = row_numbers[error['index']]
+
+def _bulk_load(session, rows, *, schema, model, columns, defaults=None, parent=None, batch_size=BULK_BATCH_SIZE,
+               loader=_insert_rows, after_load=None, row_numbers=None):
+    report = []
+    for number, batch in enumerate(_batched(rows, batch_size)):
+        offset = number * batch_size
+        valid, errors = _validate_batch(batch, offset, schema, defaults or {})
+        inserted = 0
+        try:
+            if parent is not None and valid:
+                valid = _check_parents(session, valid, errors, *parent)
+            if valid:
+                loaded = [row for _, row in valid]
+                loader(session, model, loaded, columns)
+                if after_load is not None:
+                    after_load(session, loaded)
+                session.commit()
+                inserted = len(valid)
+        except Exception as exc:
+            session.rollback()
+            errors.append({'index': None, 'error': f"пакет {number} не загружен: {exc}"})
+        _renumber_errors(errors, row_numbers)
+        for error in errors:
+            logger.error(f"{model.__tablename__}[{error['index']}]: {error['error']}")
+        report.append({'batch': number, 'inserted': inserted, 'errors': errors})
+    return report
+
+@invalidates(('experiment', 'list'))
+@with_session()
+def bulk_create_experiments(experiments, batch_size=BULK_BATCH_SIZE, *, session):
+    return _bulk_load(session, experiments, schema=ExperimentCreate, model=Experiment,
+                      columns=('name', 'description', 'created_date'),
+                      defaults={'created_date': datetime.now().date()}, batch_size=batch_size)
+
+@invalidates(('run', 'list'))
+@with_session()
+def bulk_create_runs(runs, batch_size=BULK_BATCH_SIZE, *, session):
+    return _bulk_load(session, runs, schema=RunCreate, model=Run,
+                      columns=('experiment_id', 'run_date', 'accuracy', 'flagged'),
+                      defaults={'run_date': datetime.now(UTC)},
+                      parent=('experiment_id', Experiment.experiment_id, 'Experiment'), batch_size=batch_size)
+
+@invalidates(('image', 'list'))
+@with_session()
+def bulk_create_images(images, batch_size=BULK_BATCH_SIZE, use_copy=True, row_numbers=None, *, session):
+    return _bulk_load(session, images, schema=ImageCreate, model=Image,
+                      columns=('run_id', 'file_path', 'original_name', 'attack_type', 'added_date', 'coordinates',
+                               'content_hash'),
+                      parent=('run_id', Run.run_id, 'Run'), batch_size=batch_size,
+                      loader=_copy_rows if use_copy else _insert_rows,
+                      after_load=lambda session, rows: _bump_rollups(session, _count_rollups(rows)),
+                      row_numbers=row_numbers)
+
+@cached('experiment')
 @with_session()
 def get_experiment_max_id(*, session):
     result = session.execute(text("SELECT COALESCE(MAX(experiment_id), 0) FROM experiments"))
     return result.scalar()
 
+@cached('run')
 @with_session()
 def get_run_max_id(*, session):
     result = session.execute(text("SELECT COALESCE(MAX(run_id), 0) FROM runs"))
     return result.scalar()
 
+# списки для таблиц читаются проекцией только отображаемых колонок: строки приходят кортежами
+# с доступом по имени, без построения ORM-объектов и учёта в identity map сессии
+EXPERIMENT_ROW_COLUMNS = (Experiment.experiment_id, Experiment.name, Experiment.description, Experiment.created_date)
+
+@cached('experiment')
 @with_session()
 def get_all_experiments(*, session):
-    results = session.execute(select(Experiment)).scalars().all()
-    return results
+    return session.execute(select(*EXPERIMENT_ROW_COLUMNS)).all()
 
+@cached('experiment', by_id=True)
 @with_session()
 def get_experiment_by_id(experiment_id, *, session):
     experiment = session.query(Experiment).filter(Experiment.experiment_id == experiment_id).first()
     return experiment
 
+@invalidates(('experiment', 'experiment_id'))
 @with_session(commit=True)
 def update_experiment(experiment_id, name, description, *, session):
     try:
@@ -79,23 +281,30 @@ def update_experiment(experiment_id, name, description, *, session):
     if experiment:
         experiment.name = update_data.name
         experiment.description = update_data.description
+        return experiment_id
 
+@invalidates(('experiment', 'experiment_id'), ('run', 'all'), ('image', 'all'))
 @with_session(commit=True)
 def delete_experiment(experiment_id, *, session):
     experiment = session.query(Experiment).filter(Experiment.experiment_id == experiment_id).first()
     if experiment:
         session.delete(experiment)
+        return experiment_id
+
+RUN_ROW_COLUMNS = (Run.run_id, Run.experiment_id, Run.run_date, Run.accuracy, Run.flagged)
 
+@cached('run')
 @with_session()
 def get_all_runs(*, session):
-    results = session.execute(select(Run)).scalars().all()
-    return results
+    return session.execute(select(*RUN_ROW_COLUMNS)).all()
 
+@cached('run', by_id=True)
 @with_session()
 def get_run_by_id(run_id, *, session):
     run = session.query(Run).filter(Run.run_id == run_id).first()
     return run
 
+@invalidates(('run', 'run_id'))
 @with_session(commit=True)
 def update_run(experiment_id, run_id, accuracy, flagged, *, session):
     try:
@@ -107,48 +316,150 @@ def update_run(experiment_id, run_id, accuracy, flagged, *, session):
         run.accuracy = accuracy
         run.flagged = flagged
         run.experiment_id = experiment_id
+        return run_id
 
+@invalidates(('run', 'run_id'), ('image', 'all'))
 @with_session(commit=True)
 def delete_run(run_id, *, session):
     run = session.query(Run).filter(Run.run_id == run_id).first()
     if run:
         session.delete(run)
+        return run_id
 
+@cached('image')
 @with_session()
 def get_all_images(*, session):
     images = session.query(Image).all()
     return images
 
-@with_session()
-def get_all_images_filtered(filters, *, session):
-    query = session.query(Image)
+IMAGES_PAGE_SIZE = 200
+
+
+def _like_escape(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def _search_condition(term):
+    # строка, начинающаяся с '/', ищется как префикс пути, остальное - как подстрока в пути или имени;
+    # оба варианта обслуживаются триграммными индексами ix_images_*_trgm
+    pattern = _like_escape(term)
+    if term.startswith('/'):
+        return Image.file_path.like(f"{pattern}%")
+    return or_(Image.file_path.ilike(f"%{pattern}%"), Image.original_name.ilike(f"%{pattern}%"))
+
+# region задаётся углами (x1, y1, x2, y2) в пикселях исходного изображения
+REGION_MODES = {
+    'overlaps': lambda bbox, region: bbox.overlaps(region),
+    'within': lambda bbox, region: bbox.contained_by(region),
+    'contains': lambda bbox, region: bbox.contains(region),
+}
+
+def _duplicate_condition():
+    # хэши, встречающиеся больше одного раза, считаются одним проходом по индексу ix_images_content_hash,
+    # а не подзапросом на каждую строку страницы
+    duplicated = (select(Image.content_hash)
+                  .where(Image.content_hash.is_not(None))
+                  .group_by(Image.content_hash)
+                  .having(func.count() > 1))
+    return Image.content_hash.is_not(None) & Image.content_hash.in_(duplicated)
+
+def _filter_images(query, filters):
     if filters['attack_type']:
         query = query.filter(Image.attack_type == filters['attack_type'])
     if filters['file_type']:
-        query = query.filter(Image.file_path.endswith(filters['file_type']))
-    if filters['sort_id'] == 'asc':
-        query = query.order_by(asc(Image.image_id))
-    elif filters['sort_id'] == 'desc':
-        query = query.order_by(desc(Image.image_id))
-    if not filters['sort_id']:
-        query = query.order_by(asc(Image.image_id))
+        query = query.filter(Image.file_ext == filters['file_type'])
+    if filters.get('search'):
+        query = query.filter(_search_condition(filters['search']))
+    if filters.get('region'):
+        region = make_box(*filters['region'])
+        query = query.filter(REGION_MODES[filters.get('region_mode') or 'overlaps'](Image.bbox, region))
+    if filters.get('min_area') is not None:
+        query = query.filter(Image.bbox_area >= filters['min_area'])
+    if filters.get('max_area') is not None:
+        query = query.filter(Image.bbox_area <= filters['max_area'])
+    if filters.get('duplicates'):
+        query = query.filter(_duplicate_condition())
+    return query
 
-    rows = query.join(Run, Image.run_id == Run.run_id).add_columns(Run.experiment_id).all()
+IMAGE_ROW_COLUMNS = (Image.image_id, Image.run_id, Run.experiment_id, Image.file_path, Image.original_name,
+                     Image.added_date, Image.coordinates, Image.attack_type, Image.content_hash)
 
-    images = []
-    for row in rows:
-        image_obj = row[0]
-        experiment_id = row[1]
-        setattr(image_obj, 'experiment_id', experiment_id)
-        images.append(image_obj)
+def select_images_filtered(filters, columns=IMAGE_ROW_COLUMNS):
+    stmt = _filter_images(select(*columns).join(Run, Image.run_id == Run.run_id), filters)
+    if filters['sort_id'] == 'desc':
+        return stmt.order_by(desc(Image.image_id))
+    return stmt.order_by(asc(Image.image_id))
 
-    return images
+@cached('image', 'run')
+@with_session()
+def get_all_images_filtered(filters, *, session):
+    return session.execute(select_images_filtered(filters)).all()
+
+@cached('image', 'run')
+@with_session()
+def get_images_page(filters, after_id=None, limit=IMAGES_PAGE_SIZE, *, session):
+    # keyset-пагинация: следующая страница начинается строго после последнего image_id предыдущей
+    stmt = select_images_filtered(filters)
+    if after_id is not None:
+        stmt = stmt.where(Image.image_id < after_id if filters['sort_id'] == 'desc' else Image.image_id > after_id)
+    return session.execute(stmt.limit(limit)).all()
+
+def _page_with(filters, after_id, limit, **extra):
+    filters = {'sort_id': None, 'file_type': None, 'attack_type': None, **(filters or {}), **extra}
+    return get_images_page(filters, after_id=after_id, limit=limit)
+
+def search_images(term, filters=None, after_id=None, limit=IMAGES_PAGE_SIZE):
+    return _page_with(filters, after_id, limit, search=term)
+
+def find_images_overlapping(region, filters=None, after_id=None, limit=IMAGES_PAGE_SIZE):
+    return _page_with(filters, after_id, limit, region=tuple(region), region_mode='overlaps')
+
+def find_images_within(region, filters=None, after_id=None, limit=IMAGES_PAGE_SIZE):
+    return _page_with(filters, after_id, limit, region=tuple(region), region_mode='within')
+
+def find_images_containing(region, filters=None, after_id=None, limit=IMAGES_PAGE_SIZE):
+    return _page_with(filters, after_id, limit, region=tuple(region), region_mode='contains')
+
+def find_images_by_area(min_area=None, max_area=None, filters=None, after_id=None, limit=IMAGES_PAGE_SIZE):
+    return _page_with(filters, after_id, limit, min_area=min_area, max_area=max_area)
+
+def find_duplicate_images(filters=None, after_id=None, limit=IMAGES_PAGE_SIZE):
+    return _page_with(filters, after_id, limit, duplicates=True)
+
+@cached('image', 'run')
+@with_session()
+def get_image_row(image_id, filters, *, session):
+    # строка в том же виде, что и на странице get_images_page; None, если запись удалена или не проходит фильтры
+    return session.execute(select_images_filtered(filters).where(Image.image_id == image_id)).first()
+
+# без кэша: регистрация файлов должна видеть только что добавленные пути
+@with_session()
+def get_existing_file_paths(file_paths, *, session):
+    return set(session.scalars(select(Image.file_path).where(Image.file_path.in_(file_paths))))
 
+@with_session()
+def get_images_without_hash(after_id=0, limit=BULK_BATCH_SIZE, *, session):
+    return session.execute(
+        select(Image.image_id, Image.file_path)
+        .where(Image.content_hash.is_(None), Image.image_id > after_id)
+        .order_by(Image.image_id).limit(limit)
+    ).all()
+
+@invalidates(('image', 'all'))
+@with_session(commit=True)
+def set_content_hashes(hashes, *, session):
+    # hashes: {image_id: content_hash}, одно пакетное UPDATE по первичному ключу
+    if hashes:
+        session.execute(update(Image), [{'image_id': image_id, 'content_hash': content_hash}
+                                        for image_id, content_hash in hashes.items()])
+    return len(hashes)
+
+@cached('image', by_id=True)
 @with_session()
 def get_image_by_id(image_id, *, session):
     image = session.query(Image).filter(Image.image_id == image_id).first()
     return image
 
+@invalidates(('image', 'image_id'))
 @with_session(commit=True)
 def update_image(image_id, run_id, attack_type, *, session):
     try:
@@ -157,22 +468,133 @@ def update_image(image_id, run_id, attack_type, *, session):
         raise ValueError(f"некорректные изменения: {e}") from e
     image = session.query(Image).filter(Image.image_id == image_id).first()
     if image:
+        deltas = {(image.run_id, AttackTypeEnum(image.attack_type)): -1}
+        key = (update_data.run_id, update_data.attack_type)
+        deltas[key] = deltas.get(key, 0) + 1
         image.attack_type = attack_type
         image.run_id = run_id
+        session.flush()
+        _bump_rollups(session, deltas)
+        return image_id
 
+@invalidates(('image', 'image_id'))
 @with_session(commit=True)
 def delete_image(image_id, *, session):
     image = session.query(Image).filter(Image.image_id == image_id).first()
     if image:
         session.delete(image)
+        _bump_rollups(session, {(image.run_id, AttackTypeEnum(image.attack_type)): -1})
+        return image_id
+
+
+def explain_slowest(limit=3):
+    # EXPLAIN (ANALYZE, BUFFERS) для самых медленных из замеренных запросов
+    plans = []
+    for statement in query_stats.slowest(limit, explainable_only=True):
+        try:
+            plan = explain_statement(db.database.engine, statement['statement'], statement['parameters'])
+        except Exception as exc:
+            plan = f"не удалось получить план: {exc}"
+        plans.append({**statement, 'plan': plan})
+    return plans
+
+
+DATE_BUCKETS = ('day', 'week', 'month')
+
+
+def _run_image_counts():
+    return (select(ImageRollup.run_id, func.sum(ImageRollup.image_count).label('images'))
+            .group_by(ImageRollup.run_id)
+            .subquery())
+
+def _experiment_stats(session):
+    image_counts = _run_image_counts()
+    stmt = (select(Experiment.experiment_id,
+                   Experiment.name,
+                   func.count(Run.run_id).label('runs'),
+                   func.avg(Run.accuracy).label('avg_accuracy'),
+                   func.count(Run.run_id).filter(Run.flagged.is_(True)).label('flagged_runs'),
+                   func.coalesce(func.sum(image_counts.c.images), 0).cast(Integer).label('images'))
+            .outerjoin(Run, Run.experiment_id == Experiment.experiment_id)
+            .outerjoin(image_counts, image_counts.c.run_id == Run.run_id)
+            .group_by(Experiment.experiment_id, Experiment.name)
+            .order_by(Experiment.experiment_id))
+    return [dict(row) for row in session.execute(stmt).mappings()]
+
+def _attack_type_stats(session):
+    # средняя точность по изображениям: точность прогона взвешена числом его изображений
+    weighted = func.sum(Run.accuracy * ImageRollup.image_count)
+    with_accuracy = func.sum(case((Run.accuracy.is_not(None), ImageRollup.image_count)))
+    stmt = (select(ImageRollup.attack_type,
+                   func.sum(ImageRollup.image_count).cast(Integer).label('images'),
+                   (weighted / func.nullif(with_accuracy, 0)).label('avg_accuracy'),
+                   func.coalesce(func.sum(ImageRollup.image_count).filter(Run.flagged.is_(True)), 0)
+                   .cast(Integer).label('flagged_images'))
+            .join(Run, ImageRollup.run_id == Run.run_id)
+            .group_by(ImageRollup.attack_type)
+            .order_by(ImageRollup.attack_type))
+    return [dict(row) for row in session.execute(stmt).mappings()]
+
+def _flagged_stats(session):
+    image_counts = _run_image_counts()
+    stmt = (select(Run.flagged,
+                   func.count().label('runs'),
+                   func.avg(Run.accuracy).label('avg_accuracy'),
+                   func.coalesce(func.sum(image_counts.c.images), 0).cast(Integer).label('images'))
+            .outerjoin(image_counts, image_counts.c.run_id == Run.run_id)
+            .group_by(Run.flagged)
+            .order_by(Run.flagged))
+    return [dict(row) for row in session.execute(stmt).mappings()]
+
+def _run_date_stats(session, bucket):
+    if bucket not in DATE_BUCKETS:
+        raise ValueError(f"неизвестный интервал группировки: {bucket}")
+    period = func.date_trunc(literal_column(f"'{bucket}'"), Run.run_date).label('period')
+    stmt = (select(period,
+                   func.count().label('runs'),
+                   func.avg(Run.accuracy).label('avg_accuracy'),
+                   func.count().filter(Run.flagged.is_(True)).label('flagged_runs'))
+            .group_by(period)
+            .order_by(period))
+    return [dict(row) for row in session.execute(stmt).mappings()]
+
+@cached('experiment', 'run', 'image')
+@with_session()
+def get_experiment_stats(*, session):
+    return _experiment_stats(session)
+
+@cached('image', 'run')
+@with_session()
+def get_attack_type_stats(*, session):
+    return _attack_type_stats(session)
+
+@cached('run', 'image')
+@with_session()
+def get_flagged_stats(*, session):
+    return _flagged_stats(session)
+
+@cached('run')
+@with_session()
+def get_run_date_stats(bucket='day', *, session):
+    return _run_date_stats(session, bucket)
+
+@cached('experiment', 'run', 'image')
+@with_session()
+def get_summary_stats(bucket='day', *, session):
+    return {
+        'experiments': _experiment_stats(session),
+        'attack_types': _attack_type_stats(session),
+        'flagged': _flagged_stats(session),
+        'dates': _run_date_stats(session, bucket),
+    }
 
 
 def insert_test_data():
-    for exp in experiments_data:
-        create_experiment(**exp)
-    for rn in runs_data:
-        create_run(**rn)
-    for img in images_data:
-        create_image(**img)
+    for bulk_create, data in ((bulk_create_experiments, experiments_data),
+                              (bulk_create_runs, runs_data),
+                              (bulk_create_images, images_data)):
+        errors = [error['error'] for batch in bulk_create(data) for error in batch['errors']]
+        if errors:
+            raise ValueError("\n".join(errors))
 
 
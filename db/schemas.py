@@ -61,6 +61,7 @@ class ImageCreate(BaseModel):
     attack_type: AttackTypeEnum
     added_date: Optional[datetime] = None
     coordinates: Optional[List[int]] = None
+    content_hash: Optional[str] = Field(None, max_length=64)
 
     @validator("file_path")
     @log_validation_errors("file_path")
@@ -1,14 +1,17 @@
 import os
 from PySide6.QtCore import QRect, Qt, QPoint
-from PySide6.QtGui import QPixmap, QPainter, QPen, QColor
+from PySide6.QtGui import QPixmap
 from PySide6.QtWidgets import (QMainWindow, QPushButton, QWidget, QVBoxLayout,
                                QDialog, QLabel, QLineEdit, QTextEdit, QDialogButtonBox, QDoubleSpinBox, QCheckBox,
                                QHBoxLayout, QFileDialog, QMessageBox, QComboBox, QTableWidget, QTableWidgetItem,
                                QHeaderView, QSplitter, QSizePolicy)
-from db.models import AttackTypeEnum
+from db.models import AttackTypeEnum, IMAGE_EXTENSIONS
+from db.importer import import_directory
 from db.requests import create_experiment, get_experiment_max_id, get_run_max_id, create_run, create_image
+from gui.image_canvas import ImageCanvas, read_scaled_image
 from gui.logger_widget import initialize_qt_logger, get_qt_logger_widget
 from gui.styles import styles
+from gui.workers import run_query, QueryStatusWidget
 
 
 
@@ -144,9 +147,13 @@ class ChoiceDialog(QDialog):
         btn_image = QPushButton("Добавить изображение")
         btn_image.clicked.connect(lambda: self.open_form(ImageForm))
 
+        btn_folder = QPushButton("Зарегистрировать папку")
+        btn_folder.clicked.connect(lambda: self.open_form(FolderImageForm))
+
         layout.addWidget(btn_experiment)
         layout.addWidget(btn_run)
         layout.addWidget(btn_image)
+        layout.addWidget(btn_folder)
 
         self.setLayout(layout)
 
@@ -163,7 +170,8 @@ class ExperimentForm(QDialog):
         layout = QVBoxLayout()
 
         layout.addWidget(QLabel("Номер эксперимента:"))
-        self.number_edit = QLineEdit(str(get_experiment_max_id()+1))
+        self.number_edit = QLineEdit()
+        run_query(get_experiment_max_id, on_result=self.set_number)
         self.number_edit.setReadOnly(True)
         self.number_edit.setStyleSheet("background-color: #f0f0f0; color: #666666;")
         layout.addWidget(self.number_edit)
@@ -192,13 +200,19 @@ class ExperimentForm(QDialog):
             'description': description if description else None,
         }
 
+    def set_number(self, max_id):
+        self.number_edit.setText(str(max_id + 1))
+
     def accept(self):
         data = self.get_data()
-        try:
-            create_experiment(name=data['name'], description=data['description'])
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось создать эксперимент: {str(e)}")
+        run_query(create_experiment, name=data['name'], description=data['description'],
+                  on_result=self.finish, on_error=self.on_error)
 
+    def on_error(self, e):
+        QMessageBox.critical(self, "Ошибка", f"Не удалось создать эксперимент: {str(e)}")
+        self.finish()
+
+    def finish(self, result=None):
         super().accept()
 
 
@@ -210,7 +224,8 @@ class RunForm(QDialog):
 
         layout = QVBoxLayout()
         layout.addWidget(QLabel("Номер прогона:"))
-        self.number_edit = QLineEdit(str(get_run_max_id()+1))
+        self.number_edit = QLineEdit()
+        run_query(get_run_max_id, on_result=self.set_number)
         self.number_edit.setReadOnly(True)
         self.number_edit.setStyleSheet("background-color: #f0f0f0; color: #666666;")
         layout.addWidget(self.number_edit)
@@ -245,13 +260,19 @@ class RunForm(QDialog):
             'flagged': self.verified_checkbox.isChecked() if self.verified_checkbox.isChecked() else None
         }
 
+    def set_number(self, max_id):
+        self.number_edit.setText(str(max_id + 1))
+
     def accept(self):
         data = self.get_data()
-        try:
-            create_run(experiment_id=data['experiment_id'], accuracy=data['accuracy'], flagged=data['flagged'])
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось создать прогон: {str(e)}")
+        run_query(create_run, experiment_id=data['experiment_id'], accuracy=data['accuracy'], flagged=data['flagged'],
+                  on_result=self.finish, on_error=self.on_error)
+
+    def on_error(self, e):
+        QMessageBox.critical(self, "Ошибка", f"Не удалось создать прогон: {str(e)}")
+        self.finish()
 
+    def finish(self, result=None):
         super().accept()
 
 
@@ -265,6 +286,9 @@ class ImageForm(QDialog):
         self.drawing = False
         self.start_point = None
         self.current_rect = None
+        self.original_size = None
+        self._load_task = None
+        self._load_path = None
         self.setup_ui()
         self.setStyleSheet(styles)
 
@@ -300,13 +324,12 @@ class ImageForm(QDialog):
         self.select_btn.clicked.connect(self.select_image)
         main_layout.addWidget(self.select_btn)
 
-        self.image_label = QLabel()
-        self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.image_label.setStyleSheet("border: 1px solid gray; background-color: #f0f0f0;")
-        self.image_label.mousePressEvent = self.mouse_press_event
-        self.image_label.mouseMoveEvent = self.mouse_move_event
-        self.image_label.mouseReleaseEvent = self.mouse_release_event
-        main_layout.addWidget(self.image_label)
+        self.image_canvas = ImageCanvas()
+        self.image_canvas.setStyleSheet("border: 1px solid gray; background-color: #f0f0f0;")
+        self.image_canvas.mousePressEvent = self.mouse_press_event
+        self.image_canvas.mouseMoveEvent = self.mouse_move_event
+        self.image_canvas.mouseReleaseEvent = self.mouse_release_event
+        main_layout.addWidget(self.image_canvas)
 
         coords_layout = QHBoxLayout()
         coords_layout.addWidget(QLabel("Центр X:"))
@@ -347,25 +370,41 @@ class ImageForm(QDialog):
         )
 
         if file_path:
-            self.image_path = file_path
-            self.path_edit.setText(file_path)
-            self.name_edit.setText(os.path.basename(file_path))
-
-            pixmap = QPixmap(file_path)
-            if not pixmap.isNull():
-                scaled_pixmap = pixmap.scaled(
-                    self.image_label.width(),
-                    self.image_label.height(),
-                    Qt.AspectRatioMode.KeepAspectRatio,
-                    Qt.TransformationMode.SmoothTransformation
-                )
-                self.image_label.setPixmap(scaled_pixmap)
-                self.original_pixmap = pixmap
-            else:
-                QMessageBox.warning(self, "Ошибка", "Не удалось загрузить изображение")
+            # декодируется копия размером не больше экрана: оригинал целиком в память не попадает
+            max_size = self.screen().availableSize() * self.devicePixelRatio()
+            if self._load_task is not None:
+                self._load_task.cancel()
+            self.select_btn.setText("Загрузка изображения...")
+            self._load_path = file_path
+            self._load_task = run_query(read_scaled_image, file_path, max_size,
+                                        on_result=self.on_image_loaded, on_error=self.on_image_failed)
+
+    def is_current_load(self):
+        # ответ загрузки предыдущего файла отбрасывается
+        return self._load_task is not None and self.sender() is self._load_task.signals
+
+    def on_image_loaded(self, result):
+        if not self.is_current_load():
+            return
+        image, original_size = result
+        self._load_task = None
+        self.select_btn.setText("Выбрать изображение")
+        self.image_path = self._load_path
+        self.path_edit.setText(self.image_path)
+        self.name_edit.setText(os.path.basename(self.image_path))
+        self.original_size = original_size
+        self.current_rect = None
+        self.image_canvas.setPixmap(QPixmap.fromImage(image), original_size)
+
+    def on_image_failed(self, error):
+        if not self.is_current_load():
+            return
+        self._load_task = None
+        self.select_btn.setText("Выбрать изображение")
+        QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить изображение: {str(error)}")
 
     def mouse_press_event(self, event):
-        if not self.image_label.pixmap():
+        if not self.image_canvas.pixmap():
             return
 
         if event.button() == Qt.MouseButton.LeftButton:
@@ -398,11 +437,10 @@ class ImageForm(QDialog):
             self.update_image_display()
 
     def scale_point_to_original(self, point):
-        if not self.original_pixmap:
+        if self.original_size is None:
             return None
 
-        label_pixmap = self.image_label.pixmap()
-        if not label_pixmap:
+        if not self.image_canvas.pixmap():
             return None
 
         pixmap_rect = self.get_image_rect()
@@ -410,8 +448,8 @@ class ImageForm(QDialog):
         if not pixmap_rect.contains(point):
             return None
 
-        scale_x = self.original_pixmap.width() / pixmap_rect.width()
-        scale_y = self.original_pixmap.height() / pixmap_rect.height()
+        scale_x = self.original_size.width() / pixmap_rect.width()
+        scale_y = self.original_size.height() / pixmap_rect.height()
 
         scaled_x = (point.x() - pixmap_rect.x()) * scale_x
         scaled_y = (point.y() - pixmap_rect.y()) * scale_y
@@ -419,58 +457,19 @@ class ImageForm(QDialog):
         return QPoint(int(scaled_x), int(scaled_y))
 
     def get_image_rect(self):
-        label_size = self.image_label.size()
-        pixmap = self.image_label.pixmap()
-
-        if not pixmap:
-            return QRect()
-
-        pixmap_size = pixmap.size()
-        pixmap_size.scale(label_size, Qt.AspectRatioMode.KeepAspectRatio)
-
-        x = (label_size.width() - pixmap_size.width()) // 2
-        y = (label_size.height() - pixmap_size.height()) // 2
-
-        return QRect(x, y, pixmap_size.width(), pixmap_size.height())
+        return self.image_canvas.image_rect()
 
     def update_image_display(self):
-        if not self.image_label.pixmap():
-            return
-
-        pixmap = self.original_pixmap.copy()
-        painter = QPainter(pixmap)
-        painter.setPen(QPen(QColor(255, 0, 0), 2))
-
-        if self.current_rect:
-            painter.drawRect(self.current_rect)
-
-        painter.end()
-
-        scaled_pixmap = pixmap.scaled(
-            self.image_label.width(),
-            self.image_label.height(),
-            Qt.AspectRatioMode.KeepAspectRatio,
-            Qt.TransformationMode.SmoothTransformation
-        )
-
-        self.image_label.setPixmap(scaled_pixmap)
+        # масштабированная картинка закэширована в холсте, меняется только рамка поверх неё
+        self.image_canvas.set_selection(self.current_rect)
 
     def update_coordinates(self):
+        # рамка уже в координатах исходного изображения
         if self.rect.isValid():
-            scale_x = self.original_pixmap.width() / self.image_label.pixmap().width()
-            scale_y = self.original_pixmap.height() / self.image_label.pixmap().height()
-
-            scaled_rect = QRect(
-                int(self.rect.x() * scale_x),
-                int(self.rect.y() * scale_y),
-                int(self.rect.width() * scale_x),
-                int(self.rect.height() * scale_y)
-            )
-
-            self.center_x_edit.setText(str(scaled_rect.center().x()))
-            self.center_y_edit.setText(str(scaled_rect.center().y()))
-            self.width_edit.setText(str(scaled_rect.width()))
-            self.height_edit.setText(str(scaled_rect.height()))
+            self.center_x_edit.setText(str(self.rect.center().x()))
+            self.center_y_edit.setText(str(self.rect.center().y()))
+            self.width_edit.setText(str(self.rect.width()))
+            self.height_edit.setText(str(self.rect.height()))
 
     def get_data(self):
         return {
@@ -486,12 +485,98 @@ class ImageForm(QDialog):
     def accept(self):
         try:
             data = self.get_data()
-            create_image(run_id=data['run_id'],
-                         file_path=data['image_path'],
-                         attack_type=data['attack_type'],
-                         original_name=data['image_name'],
-                         coordinates=[data['center_x'], data['center_y'],data['width'],data['height']])
         except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось добавить изображение: {str(e)}")
+            self.on_error(e)
+            return
+        run_query(create_image,
+                  run_id=data['run_id'],
+                  file_path=data['image_path'],
+                  attack_type=data['attack_type'],
+                  original_name=data['image_name'],
+                  coordinates=[data['center_x'], data['center_y'], data['width'], data['height']],
+                  on_result=self.finish, on_error=self.on_error)
+
+    def on_error(self, e):
+        QMessageBox.critical(self, "Ошибка", f"Не удалось добавить изображение: {str(e)}")
+        self.finish()
+
+    def finish(self, result=None):
+        super().accept()
+
+
+class FolderImageForm(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Регистрация папки с изображениями")
+        self.setStyleSheet(styles)
+
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel("Папка*:"))
+        folder_layout = QHBoxLayout()
+        self.folder_edit = QLineEdit()
+        folder_layout.addWidget(self.folder_edit)
+        self.select_btn = QPushButton("Выбрать папку")
+        self.select_btn.clicked.connect(self.select_folder)
+        folder_layout.addWidget(self.select_btn)
+        layout.addLayout(folder_layout)
+
+        layout.addWidget(QLabel("Номер прогона*:"))
+        self.run_id_edit = QLineEdit()
+        layout.addWidget(self.run_id_edit)
+
+        layout.addWidget(QLabel("Тип атаки:"))
+        self.attack_type_combo = QComboBox()
+        for attack_type in AttackTypeEnum:
+            self.attack_type_combo.addItem(attack_type.value, attack_type)
+        layout.addWidget(self.attack_type_combo)
+
+        layout.addWidget(QLabel(f"Файлы {', '.join(IMAGE_EXTENSIONS)} (с учётом регистра) во всех подпапках; "
+                                "уже добавленные пути пропускаются"))
 
-        super().accept()
\ No newline at end of file
+        self.query_status = QueryStatusWidget(self)
+        layout.addWidget(self.query_status)
+
+        self.button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        self.button_box.accepted.connect(self.accept)
+        self.button_box.rejected.connect(self.reject)
+        self.query_status.busy_changed.connect(
+            lambda busy: self.button_box.button(QDialogButtonBox.StandardButton.Ok).setEnabled(not busy)
+        )
+        layout.addWidget(self.button_box)
+
+        self.setLayout(layout)
+
+    def select_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Выберите папку с изображениями")
+        if folder:
+            self.folder_edit.setText(folder)
+
+    def accept(self):
+        try:
+            run_id = int(self.run_id_edit.text())
+        except ValueError:
+            QMessageBox.warning(self, "Ошибка", "Номер прогона должен быть числом")
+            return
+        self.query_status.run(
+            import_directory, self.folder_edit.text().strip(), run_id, self.attack_type_combo.currentData(),
+            on_result=self.finish, on_error=self.on_error, on_cancel=self.on_cancelled,
+            report_progress=True, message="Поиск файлов..."
+        )
+
+    def on_error(self, e):
+        QMessageBox.critical(self, "Ошибка", f"Не удалось зарегистрировать папку: {str(e)}")
+
+    def on_cancelled(self):
+        QMessageBox.information(self, "Регистрация папки",
+                                "Регистрация прервана. Уже записанные пакеты сохранены, "
+                                "при повторном запуске они будут пропущены.")
+        self.finish()
+
+    def finish(self, result=None):
+        if result is not None:
+            QMessageBox.information(
+                self, "Регистрация папки",
+                f"Найдено файлов: {result['found']}\nДобавлено: {result['inserted']}\n"
+                f"Уже были в базе: {result['skipped']}\nОшибок: {result['failed']}"
+            )
+        super().accept()
@@ -1,14 +1,17 @@
 
 from PySide6.QtWidgets import (
     QDialog, QFormLayout, QLineEdit, QHBoxLayout, QVBoxLayout, QPushButton,
-    QLabel, QMessageBox
+    QLabel, QMessageBox, QGroupBox, QSpinBox, QCheckBox
 )
 from PySide6.QtCore import Qt, Signal
 
+from db.cache import cache
 from db.config import Settings, settings
-from db.database import perform_connection, perform_recreate_tables
+from db.database import perform_connection, perform_recreate_tables, get_pool_status
+from db.migrations import perform_upgrade
 from db.requests import insert_test_data
 from gui.styles import styles
+from gui.workers import run_query
 
 
 class ConnectionDialog(QDialog):
@@ -26,6 +29,7 @@ class ConnectionDialog(QDialog):
         self._recreate_callback = recreate_callback
         self._connected = bool(self.__class__._ever_connected)
         self._connection_info = dict(self.__class__._last_connection_info)
+        self._pending_params = {}
 
         self.init_ui()
         self.connect_signals()
@@ -47,30 +51,66 @@ class ConnectionDialog(QDialog):
         form.addRow("DB_NAME:", self.name_edit)
         form.addRow("DB_USER:", self.user_edit)
 
+        self.pool_size_spin = QSpinBox()
+        self.pool_size_spin.setRange(1, 1000)
+        self.max_overflow_spin = QSpinBox()
+        self.max_overflow_spin.setRange(0, 1000)
+        self.pool_timeout_spin = QSpinBox()
+        self.pool_timeout_spin.setRange(1, 3600)
+        self.pool_timeout_spin.setSuffix(" с")
+        self.pool_recycle_spin = QSpinBox()
+        self.pool_recycle_spin.setRange(-1, 86400)
+        self.pool_recycle_spin.setSuffix(" с")
+        self.statement_timeout_spin = QSpinBox()
+        self.statement_timeout_spin.setRange(0, 86400000)
+        self.statement_timeout_spin.setSuffix(" мс")
+        self.pre_ping_checkbox = QCheckBox("Проверять соединение перед выдачей")
+        self.echo_checkbox = QCheckBox("Выводить SQL в консоль")
+        self.set_engine_params(settings.model_dump())
+
+        engine_form = QFormLayout()
+        engine_form.addRow("DB_POOL_SIZE:", self.pool_size_spin)
+        engine_form.addRow("DB_MAX_OVERFLOW:", self.max_overflow_spin)
+        engine_form.addRow("DB_POOL_TIMEOUT:", self.pool_timeout_spin)
+        engine_form.addRow("DB_POOL_RECYCLE:", self.pool_recycle_spin)
+        engine_form.addRow("DB_STATEMENT_TIMEOUT:", self.statement_timeout_spin)
+        engine_form.addRow(self.pre_ping_checkbox)
+        engine_form.addRow(self.echo_checkbox)
+
+        engine_group = QGroupBox("Пул соединений")
+        engine_group.setLayout(engine_form)
+
         self.connect_btn = QPushButton("Подключиться")
         self.recreate_btn = QPushButton("Пересоздать таблицы")
+        self.migrate_btn = QPushButton("Обновить схему")
         self.load_env_btn = QPushButton("Взять из окружения")
+        self.pool_status_btn = QPushButton("Состояние пула")
 
         btn_layout = QHBoxLayout()
         btn_layout.addWidget(self.connect_btn)
         btn_layout.addWidget(self.recreate_btn)
+        btn_layout.addWidget(self.migrate_btn)
         btn_layout.addWidget(self.load_env_btn)
+        btn_layout.addWidget(self.pool_status_btn)
 
         self.status_label = QLabel("")
         self.status_label.setAlignment(Qt.AlignmentFlag.AlignLeft)
 
         main_layout = QVBoxLayout()
         main_layout.addLayout(form)
+        main_layout.addWidget(engine_group)
         main_layout.addLayout(btn_layout)
         main_layout.addWidget(self.status_label)
 
         self.setLayout(main_layout)
-        self.setFixedWidth(480)
+        self.setFixedWidth(560)
 
     def connect_signals(self):
         self.connect_btn.clicked.connect(self.on_connect_clicked)
         self.recreate_btn.clicked.connect(self.on_recreate_clicked)
+        self.migrate_btn.clicked.connect(self.on_migrate_clicked)
         self.load_env_btn.clicked.connect(self.on_load_env_clicked)
+        self.pool_status_btn.clicked.connect(self.on_pool_status_clicked)
 
     def on_load_env_clicked(self):
 
@@ -91,6 +131,8 @@ class ConnectionDialog(QDialog):
             'DB_USER': self.user_edit
         }
 
+        self.set_engine_params(settings.model_dump())
+
         missing = []
         for key, widget in mapping.items():
             val = env_values.get(key)
@@ -108,6 +150,20 @@ class ConnectionDialog(QDialog):
                 )
             )
 
+    def on_pool_status_clicked(self):
+        status = get_pool_status()
+        if status is None:
+            QMessageBox.information(self, "Состояние пула", "Подключение не установлено.")
+            return
+        cache_stats = cache.stats()
+        QMessageBox.information(
+            self,
+            "Состояние пула",
+            "Размер пула: {size}\nСвободно: {checked_in}\nВыдано: {checked_out}\nСверх лимита: {overflow}".format(**status)
+            + "\n\nКэш запросов: {size} записей, попаданий {hits}, промахов {misses} ({rate:.0%})".format(
+                rate=cache_stats['hit_rate'], **cache_stats)
+        )
+
     def on_connect_clicked(self):
         if self._connected:
             return
@@ -116,18 +172,17 @@ class ConnectionDialog(QDialog):
         if '' in params.values():
             QMessageBox.critical(self, "ошибка", 'не все поля заполнены')
             return
+        params.update(self.get_engine_params())
         self.set_actions_enabled(False)
         self.status_label.setText("Подключение...")
 
-        try:
-            if self._connect_callback is not None:
-                result = self._connect_callback(params)
-            else:
-                result = perform_connection(params)
-        except Exception as exc:
-            #QMessageBox.critical(self, "Ошибка при подключении", f"{type(exc).__name__}: {exc}")
-            result = False
+        connect = self._connect_callback if self._connect_callback is not None else perform_connection
+        self._pending_params = params
+        run_query(connect, params, on_result=self.on_connect_finished,
+                  on_error=lambda exc: self.on_connect_finished(False))
 
+    def on_connect_finished(self, result):
+        params = self._pending_params
         if result:
             self._connected = True
             self._connection_info = params.copy()
@@ -153,33 +208,61 @@ class ConnectionDialog(QDialog):
         self.set_actions_enabled(False)
         self.status_label.setText("Пересоздание таблиц...")
 
-        try:
-            if self._recreate_callback is not None:
-                result = self._recreate_callback(self._connection_info)
-            else:
-                result = perform_recreate_tables()
-
-            if result:
-                self.status_label.setText("Таблицы пересозданы успешно.")
-
-                msg_box = QMessageBox(self)
-                msg_box.setWindowTitle("Пересоздание таблиц")
-                msg_box.setText("Таблицы успешно пересозданы.")
-                msg_box.setIcon(QMessageBox.Information)
-                msg_box.addButton(QMessageBox.Ok)
-                btn_save = msg_box.addButton("внести тестовые данные", QMessageBox.ActionRole)
-                msg_box.exec()
-                if msg_box.clickedButton() == btn_save:
-                    insert_test_data()
-            else:
-                self.status_label.setText("Не удалось пересоздать таблицы.")
-                QMessageBox.critical(self, "Пересоздание таблиц", "Пересоздание не выполнено.")
-        except Exception as exc:
-            self.status_label.setText("Ошибка при пересоздании таблиц.")
-            QMessageBox.critical(self, "Ошибка при пересоздании таблиц", f"{type(exc).__name__}: {exc}")
-        finally:
+        if self._recreate_callback is not None:
+            run_query(self._recreate_callback, self._connection_info,
+                      on_result=self.on_recreate_finished, on_error=self.on_recreate_failed)
+        else:
+            run_query(perform_recreate_tables, on_result=self.on_recreate_finished, on_error=self.on_recreate_failed)
+
+    def on_recreate_finished(self, result):
+        if not result:
+            self.status_label.setText("Не удалось пересоздать таблицы.")
+            QMessageBox.critical(self, "Пересоздание таблиц", "Пересоздание не выполнено.")
+            self.set_actions_enabled(True)
+            return
+
+        self.status_label.setText("Таблицы пересозданы успешно.")
+
+        msg_box = QMessageBox(self)
+        msg_box.setWindowTitle("Пересоздание таблиц")
+        msg_box.setText("Таблицы успешно пересозданы.")
+        msg_box.setIcon(QMessageBox.Information)
+        msg_box.addButton(QMessageBox.Ok)
+        btn_save = msg_box.addButton("внести тестовые данные", QMessageBox.ActionRole)
+        msg_box.exec()
+        if msg_box.clickedButton() == btn_save:
+            self.status_label.setText("Внесение тестовых данных...")
+            run_query(insert_test_data, on_result=self.on_test_data_inserted, on_error=self.on_recreate_failed)
+        else:
             self.set_actions_enabled(True)
 
+    def on_test_data_inserted(self, result):
+        self.status_label.setText("Тестовые данные внесены.")
+        self.set_actions_enabled(True)
+
+    def on_recreate_failed(self, exc):
+        self.status_label.setText("Ошибка при пересоздании таблиц.")
+        QMessageBox.critical(self, "Ошибка при пересоздании таблиц", f"{type(exc).__name__}: {exc}")
+        self.set_actions_enabled(True)
+
+    def on_migrate_clicked(self):
+        if not self._connected:
+            QMessageBox.warning(self, "Обновление схемы", "Сначала подключитесь к базе данных.")
+            return
+
+        self.set_actions_enabled(False)
+        self.status_label.setText("Применение миграций...")
+        run_query(perform_upgrade, on_result=self.on_migrate_finished,
+                  on_error=lambda exc: self.on_migrate_finished(False))
+
+    def on_migrate_finished(self, result):
+        if result:
+            self.status_label.setText("Схема обновлена.")
+        else:
+            self.status_label.setText("Не удалось обновить схему.")
+            QMessageBox.critical(self, "Обновление схемы", "Миграции не применены.")
+        self.set_actions_enabled(True)
+
     def set_actions_enabled(self, enabled: bool):
         edits_enabled = enabled and (not self._connected)
 
@@ -188,9 +271,13 @@ class ConnectionDialog(QDialog):
         self.port_edit.setEnabled(edits_enabled)
         self.name_edit.setEnabled(edits_enabled)
         self.user_edit.setEnabled(edits_enabled)
+        for widget in (self.pool_size_spin, self.max_overflow_spin, self.pool_timeout_spin, self.pool_recycle_spin,
+                       self.statement_timeout_spin, self.pre_ping_checkbox, self.echo_checkbox):
+            widget.setEnabled(edits_enabled)
 
         self.connect_btn.setEnabled(enabled and (not self._connected))
         self.recreate_btn.setEnabled(enabled and self._connected)
+        self.migrate_btn.setEnabled(enabled and self._connected)
         self.load_env_btn.setEnabled(edits_enabled)
 
     def update_ui_state(self):
@@ -212,4 +299,24 @@ class ConnectionDialog(QDialog):
             'DB_PORT': self.port_edit.text(),
             'DB_NAME': self.name_edit.text(),
             'DB_USER': self.user_edit.text()
-        }
\ No newline at end of file
+        }
+
+    def get_engine_params(self):
+        return {
+            'DB_POOL_SIZE': self.pool_size_spin.value(),
+            'DB_MAX_OVERFLOW': self.max_overflow_spin.value(),
+            'DB_POOL_TIMEOUT': self.pool_timeout_spin.value(),
+            'DB_POOL_RECYCLE': self.pool_recycle_spin.value(),
+            'DB_STATEMENT_TIMEOUT': self.statement_timeout_spin.value(),
+            'DB_POOL_PRE_PING': self.pre_ping_checkbox.isChecked(),
+            'DB_ECHO': self.echo_checkbox.isChecked()
+        }
+
+    def set_engine_params(self, params):
+        self.pool_size_spin.setValue(int(params['DB_POOL_SIZE']))
+        self.max_overflow_spin.setValue(int(params['DB_MAX_OVERFLOW']))
+        self.pool_timeout_spin.setValue(int(params['DB_POOL_TIMEOUT']))
+        self.pool_recycle_spin.setValue(int(params['DB_POOL_RECYCLE']))
+        self.statement_timeout_spin.setValue(int(params['DB_STATEMENT_TIMEOUT']))
+        self.pre_ping_checkbox.setChecked(bool(params['DB_POOL_PRE_PING']))
+        self.echo_checkbox.setChecked(bool(params['DB_ECHO']))
\ No newline at end of file
@@ -0,0 +1,53 @@
+from PySide6.QtCore import Qt, QEvent, Signal
+from PySide6.QtWidgets import QStyledItemDelegate, QStyleOptionButton, QStyle, QPushButton
+
+
+class ButtonDelegate(QStyledItemDelegate):
+    # кнопка рисуется в ячейке, а не создаётся виджетом на каждую строку,
+    # поэтому число дочерних виджетов таблицы не зависит от числа строк
+    clicked = Signal(int)
+
+    def __init__(self, text, view):
+        super().__init__(view)
+        self.text = text
+        self._pressed = None
+        # скрытая кнопка-образец: через неё к отрисовке применяются правила QPushButton из таблицы стилей
+        self._button = QPushButton(text, view.viewport())
+        self._button.hide()
+
+    def button_option(self, option, index):
+        button = QStyleOptionButton()
+        button.initFrom(self._button)
+        button.rect = option.rect.adjusted(2, 2, -2, -2)
+        button.text = self.text
+        button.state = QStyle.State_Enabled
+        if self._pressed == (index.row(), index.column()):
+            button.state |= QStyle.State_Sunken
+        else:
+            button.state |= QStyle.State_Raised
+        if option.state & QStyle.State_MouseOver:
+            button.state |= QStyle.State_MouseOver
+        return button
+
+    def paint(self, painter, option, index):
+        self._button.style().drawControl(QStyle.CE_PushButton, self.button_option(option, index), painter, self._button)
+
+    def sizeHint(self, option, index):
+        return self._button.sizeHint()
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() not in (QEvent.MouseButtonPress, QEvent.MouseButtonRelease, QEvent.MouseButtonDblClick):
+            return False
+        if event.button() != Qt.LeftButton:
+            return False
+        cell = (index.row(), index.column())
+        if event.type() == QEvent.MouseButtonPress:
+            self._pressed = cell
+        elif event.type() == QEvent.MouseButtonRelease:
+            pressed = self._pressed == cell
+            self._pressed = None
+            if pressed and option.rect.contains(event.position().toPoint()):
+                self.clicked.emit(index.row())
+        self.parent().viewport().update(option.rect)
+        # событие поглощается, чтобы клик по кнопке не выделял строку и не открывал правку дважды
+        return True
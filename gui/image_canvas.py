@@ -0,0 +1,101 @@
+from PySide6.QtCore import Qt, QRect, QSize
+from PySide6.QtGui import QPainter, QPen, QColor, QImageReader
+from PySide6.QtWidgets import QWidget, QStyle, QStyleOption
+
+SELECTION_PEN_WIDTH = 2
+
+
+def read_scaled_image(path, max_size):
+    # выполняется в пуле потоков (QImage, в отличие от QPixmap, можно создавать вне GUI-потока);
+    # JPEG декодируется сразу в уменьшенном размере, остальные форматы уменьшаются после чтения
+    reader = QImageReader(path)
+    original = reader.size()
+    if original.isValid() and (original.width() > max_size.width() or original.height() > max_size.height()):
+        reader.setScaledSize(original.scaled(max_size, Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        raise ValueError(reader.errorString())
+    return image, original if original.isValid() else image.size()
+
+
+class ImageCanvas(QWidget):
+    # исходник масштабируется один раз на размер виджета, рамка выделения рисуется поверх в paintEvent;
+    # при перетаскивании перерисовывается только область старой и новой рамки
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._source = None
+        self._source_size = QSize()
+        self._scaled = None
+        self._selection = QRect()
+        self._pen = QPen(QColor(255, 0, 0), SELECTION_PEN_WIDTH)
+
+    def sizeHint(self):
+        return QSize(640, 480)
+
+    def setPixmap(self, pixmap, source_size=None):
+        # картинка может быть уменьшенной копией: рамка и координаты считаются в размерах исходного файла
+        self._source = pixmap
+        self._source_size = QSize(source_size) if source_size is not None else pixmap.size()
+        self._selection = QRect()
+        self.rescale()
+        self.update()
+
+    def pixmap(self):
+        return self._scaled
+
+    def source_size(self):
+        return QSize(self._source_size)
+
+    def rescale(self):
+        if self._source is None or self._source.isNull():
+            self._scaled = None
+            return
+        self._scaled = self._source.scaled(self.size(), Qt.AspectRatioMode.KeepAspectRatio,
+                                           Qt.TransformationMode.SmoothTransformation)
+
+    def image_rect(self):
+        if self._scaled is None:
+            return QRect()
+        size = self._scaled.size()
+        return QRect((self.width() - size.width()) // 2, (self.height() - size.height()) // 2,
+                     size.width(), size.height())
+
+    def selection(self):
+        return QRect(self._selection)
+
+    def set_selection(self, rect):
+        previous = self.map_to_widget(self._selection)
+        self._selection = QRect(rect) if rect is not None else QRect()
+        current = self.map_to_widget(self._selection)
+        margin = SELECTION_PEN_WIDTH + 1
+        dirty = previous.united(current) if previous.isValid() else current
+        if dirty.isValid():
+            self.update(dirty.adjusted(-margin, -margin, margin, margin))
+
+    def map_to_widget(self, rect):
+        # рамка хранится в координатах исходника
+        image_rect = self.image_rect()
+        if not rect.isValid() or image_rect.isEmpty():
+            return QRect()
+        scale_x = image_rect.width() / self._source_size.width()
+        scale_y = image_rect.height() / self._source_size.height()
+        return QRect(image_rect.x() + int(rect.x() * scale_x), image_rect.y() + int(rect.y() * scale_y),
+                     max(int(rect.width() * scale_x), 1), max(int(rect.height() * scale_y), 1))
+
+    def resizeEvent(self, event):
+        self.rescale()
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        # фон и рамка виджета из таблицы стилей
+        option = QStyleOption()
+        option.initFrom(self)
+        self.style().drawPrimitive(QStyle.PrimitiveElement.PE_Widget, option, painter, self)
+
+        if self._scaled is not None:
+            painter.drawPixmap(self.image_rect().topLeft(), self._scaled)
+        if self._selection.isValid():
+            painter.setPen(self._pen)
+            painter.drawRect(self.map_to_widget(self._selection))
+        painter.end()
@@ -0,0 +1,109 @@
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView,
+    QTextEdit, QSplitter, QMessageBox
+)
+
+from db.query_stats import query_stats
+from db.requests import explain_slowest
+from gui.styles import styles
+from gui.workers import QueryStatusWidget
+
+STATS_COLUMNS = (
+    ('kind', "Тип"), ('name', "Функция / запрос"), ('count', "Вызовов"), ('p50_ms', "p50, мс"),
+    ('p95_ms', "p95, мс"), ('max_ms', "Макс., мс"), ('rows', "Строк"),
+)
+KIND_TITLES = {'function': "функция", 'statement': "SQL"}
+EXPLAIN_LIMIT = 3
+
+
+class QueryStatsDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Статистика запросов")
+        self.setMinimumSize(800, 500)
+        self.setStyleSheet(styles)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(15, 15, 15, 15)
+
+        button_layout = QHBoxLayout()
+        self.refresh_btn = QPushButton("Обновить")
+        self.refresh_btn.clicked.connect(self.load_data)
+        self.reset_btn = QPushButton("Сбросить")
+        self.reset_btn.clicked.connect(self.reset_stats)
+        self.explain_btn = QPushButton("EXPLAIN самых медленных")
+        self.explain_btn.clicked.connect(self.explain)
+        button_layout.addWidget(self.refresh_btn)
+        button_layout.addWidget(self.reset_btn)
+        button_layout.addWidget(self.explain_btn)
+        button_layout.addStretch()
+        layout.addLayout(button_layout)
+
+        self.table = QTableWidget()
+        self.table.setColumnCount(len(STATS_COLUMNS))
+        self.table.setHorizontalHeaderLabels([title for _, title in STATS_COLUMNS])
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionMode(QAbstractItemView.NoSelection)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+
+        self.plan_edit = QTextEdit()
+        self.plan_edit.setReadOnly(True)
+        self.plan_edit.setPlaceholderText("Планы выполнения самых медленных запросов")
+
+        splitter = QSplitter(Qt.Vertical)
+        splitter.addWidget(self.table)
+        splitter.addWidget(self.plan_edit)
+        layout.addWidget(splitter)
+
+        self.query_status = QueryStatusWidget(self)
+        self.query_status.busy_changed.connect(lambda busy: self.explain_btn.setEnabled(not busy))
+        layout.addWidget(self.query_status)
+
+        self.load_data()
+
+    def load_data(self):
+        rows = query_stats.summary()
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, (field, _) in enumerate(STATS_COLUMNS):
+                self.table.setItem(row, column, self.make_item(field, values[field]))
+        self.table.setSortingEnabled(True)
+
+    def make_item(self, field, value):
+        item = QTableWidgetItem()
+        if field == 'kind':
+            item.setText(KIND_TITLES[value])
+        elif field == 'name':
+            item.setText(value if len(value) <= 200 else value[:200] + "…")
+            item.setToolTip(value)
+        elif isinstance(value, float):
+            # числа кладутся как данные, чтобы сортировка по колонке была числовой
+            item.setData(Qt.DisplayRole, round(value, 1))
+        else:
+            item.setData(Qt.DisplayRole, value)
+        return item
+
+    def reset_stats(self):
+        query_stats.reset()
+        self.plan_edit.clear()
+        self.load_data()
+
+    def explain(self):
+        self.query_status.run(
+            explain_slowest, EXPLAIN_LIMIT,
+            on_result=self.show_plans,
+            on_error=lambda e: QMessageBox.critical(self, "Ошибка", f"Не удалось получить планы: {str(e)}"),
+            message="EXPLAIN ANALYZE..."
+        )
+
+    def show_plans(self, plans):
+        if not plans:
+            self.plan_edit.setPlainText("Замеренных запросов пока нет.")
+            return
+        blocks = [f"-- {plan['duration_ms']:.0f} мс\n{plan['statement']}\n\n{plan['plan']}" for plan in plans]
+        self.plan_edit.setPlainText("\n\n".join(blocks))
+        self.load_data()
@@ -0,0 +1,158 @@
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, Signal
+
+from db.models import AttackTypeEnum
+from db.requests import get_images_page, IMAGES_PAGE_SIZE
+from gui.workers import run_query
+
+THUMBNAIL_COLUMN = 0
+HASH_COLUMN = 9
+HASH_PREFIX_LENGTH = 12
+
+
+class ImagesTableModel(QAbstractTableModel):
+    load_failed = Signal(object)
+
+    def __init__(self, columns, parent=None, page_size=IMAGES_PAGE_SIZE, runner=run_query, thumbnails=None,
+                 thumbnail_size=None):
+        super().__init__(parent)
+        self._columns = columns
+        self._page_size = page_size
+        self._runner = runner
+        self._thumbnails = thumbnails
+        self._thumbnail_size = thumbnail_size
+        if thumbnails is not None:
+            thumbnails.ready.connect(self.on_thumbnail_ready)
+        self._rows = []
+        self._filters = None
+        self._has_more = False
+        self._pending = None
+
+    def set_filters(self, filters):
+        self.cancel_fetch()
+        self.beginResetModel()
+        self._filters = dict(filters)
+        self._rows = []
+        self._has_more = True
+        self.endResetModel()
+        self.fetchMore()
+
+    def reload(self):
+        if self._filters is not None:
+            self.set_filters(self._filters)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._columns)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self._columns[section]
+        return None
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DecorationRole and index.column() == THUMBNAIL_COLUMN and self._thumbnails is not None:
+            # превью запрашивается только при отрисовке строки: невидимые строки картинки не строят
+            image = self._rows[index.row()]
+            return self._thumbnails.pixmap(image.image_id, image.file_path, self._thumbnail_size)
+        if role == Qt.ToolTipRole and index.column() == HASH_COLUMN:
+            return getattr(self._rows[index.row()], 'content_hash', None)
+        if role != Qt.DisplayRole:
+            return None
+        values = self.row_values(self._rows[index.row()])
+        if index.column() >= len(values):
+            return None
+        return values[index.column()]
+
+    def row_values(self, image):
+        return [
+            None,
+            str(image.image_id),
+            str(image.run_id),
+            str(getattr(image, 'experiment_id', '')),
+            image.file_path,
+            image.original_name,
+            str(image.added_date),
+            str(image.coordinates),
+            AttackTypeEnum(image.attack_type).value,
+            (getattr(image, 'content_hash', None) or '')[:HASH_PREFIX_LENGTH],
+        ]
+
+    def image_id(self, row):
+        return self._rows[row].image_id
+
+    def find_row(self, image_id):
+        for row, image in enumerate(self._rows):
+            if image.image_id == image_id:
+                return row
+        return None
+
+    def update_row(self, row, image):
+        self._rows[row] = image
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self._columns) - 1))
+
+    def remove_row(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._rows[row]
+        self.endRemoveRows()
+
+    def on_thumbnail_ready(self, image_id):
+        # вид перерисует только видимые ячейки колонки, поиск строки по id не нужен
+        if self._rows:
+            self.dataChanged.emit(self.index(0, THUMBNAIL_COLUMN), self.index(len(self._rows) - 1, THUMBNAIL_COLUMN),
+                                  [Qt.DecorationRole])
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return self._has_more and self._pending is None
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        after_id = self._rows[-1].image_id if self._rows else None
+        self._pending = self._runner(
+            get_images_page, self._filters, after_id=after_id, limit=self._page_size,
+            on_result=self.on_page_loaded, on_error=self.on_page_failed, on_cancel=self.on_page_cancelled
+        )
+
+    def cancel_fetch(self):
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+
+    def is_current(self):
+        # ответы отменённых или устаревших запросов приходят от чужих задач и отбрасываются
+        return self._pending is not None and self.sender() is self._pending.signals
+
+    def on_page_failed(self, error):
+        if self.is_current():
+            self._pending = None
+            self._has_more = False
+            self.load_failed.emit(error)
+
+    def on_page_cancelled(self):
+        if self.is_current():
+            self._pending = None
+
+    def on_page_loaded(self, page):
+        if not self.is_current():
+            return
+        self._pending = None
+        self._has_more = len(page) == self._page_size
+        if not page:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+        self._rows.extend(page)
+        self.endInsertRows()
@@ -0,0 +1,261 @@
+import mmap
+import multiprocessing
+import os
+import struct
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from PySide6.QtCore import Qt, QObject, Signal, QSize, QByteArray, QBuffer, QIODevice, QCoreApplication
+from PySide6.QtGui import QImageReader, QPixmap
+
+from db.config import settings
+
+THUMBNAIL_SIZE = 128
+THUMBNAIL_FORMAT = "JPEG"
+THUMBNAIL_QUALITY = 85
+THUMBNAIL_MEMORY_ITEMS = 2000
+THUMBNAIL_QUEUE_LIMIT = 256
+
+# запись пака: заголовок (метка, image_id, mtime файла в нс, длина) и JPEG-данные превью
+RECORD_MAGIC = b'THMB'
+RECORD_HEADER = struct.Struct('<4sqqI')
+
+
+def render_thumbnail(path, size=THUMBNAIL_SIZE):
+    # выполняется в процессе пула: декодер сразу уменьшает картинку, полный кадр в память не попадает
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    original = reader.size()
+    if original.isValid():
+        reader.setScaledSize(original.scaled(QSize(size, size), Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return None
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, THUMBNAIL_FORMAT, THUMBNAIL_QUALITY)
+    return bytes(data)
+
+
+def file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def refresh_thumbnail(path, packed_mtime, size=THUMBNAIL_SIZE):
+    # выполняется в процессе пула вместе с проверкой файла: (mtime, None) — превью в паке актуально,
+    # (None, None) — файла нет или он не читается, иначе (mtime, данные) нового превью
+    mtime = file_mtime(path)
+    if mtime is None or mtime == packed_mtime:
+        return mtime, None
+    data = render_thumbnail(path, size)
+    return (mtime, data) if data is not None else (None, None)
+
+
+class ThumbnailPack:
+    # один файл, в который записи только дописываются; индекс строится проходом по заголовкам при открытии,
+    # повторная запись того же image_id перекрывает прежнюю
+    def __init__(self, path):
+        self.path = path
+        self._index = {}
+        self._file = None
+        self._map = None
+        self._dead_bytes = 0
+
+    def open(self):
+        if self._file is not None:
+            return
+        self._file = open(self.path, 'a+b')
+        self._remap()
+        end = self._scan()
+        if end < self._size():
+            # хвост недописанной записи после аварийного завершения
+            self._close_map()
+            self._file.truncate(end)
+            self._remap()
+        if self._dead_bytes > end // 2:
+            self.compact()
+
+    def close(self):
+        self._close_map()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._index = {}
+        self._dead_bytes = 0
+
+    def _size(self):
+        return os.fstat(self._file.fileno()).st_size
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _remap(self):
+        self._close_map()
+        if self._size() > 0:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _scan(self):
+        offset = 0
+        size = len(self._map) if self._map is not None else 0
+        while offset + RECORD_HEADER.size <= size:
+            magic, image_id, mtime, length = RECORD_HEADER.unpack_from(self._map, offset)
+            data_offset = offset + RECORD_HEADER.size
+            if magic != RECORD_MAGIC or data_offset + length > size:
+                break
+            self._add(image_id, (data_offset, length, mtime))
+            offset = data_offset + length
+        return offset
+
+    def _add(self, image_id, entry):
+        previous = self._index.get(image_id)
+        if previous is not None:
+            self._dead_bytes += RECORD_HEADER.size + previous[1]
+        self._index[image_id] = entry
+
+    def __len__(self):
+        return len(self._index)
+
+    def mtime(self, image_id):
+        self.open()
+        entry = self._index.get(image_id)
+        return entry[2] if entry is not None else None
+
+    def get(self, image_id, mtime):
+        self.open()
+        entry = self._index.get(image_id)
+        if entry is None or entry[2] != mtime:
+            return None
+        offset, length, _ = entry
+        if self._map is None or offset + length > len(self._map):
+            self._remap()
+        return self._map[offset:offset + length]
+
+    def put(self, image_id, mtime, data):
+        self.open()
+        self._file.seek(0, os.SEEK_END)
+        offset = self._file.tell()
+        self._file.write(RECORD_HEADER.pack(RECORD_MAGIC, image_id, mtime, len(data)))
+        self._file.write(data)
+        self._file.flush()
+        self._add(image_id, (offset + RECORD_HEADER.size, len(data), mtime))
+
+    def compact(self):
+        # переписывает пак без перекрытых записей
+        self.open()
+        temp_path = self.path + '.tmp'
+        index = {}
+        with open(temp_path, 'wb') as temp:
+            for image_id, (offset, length, mtime) in self._index.items():
+                temp.write(RECORD_HEADER.pack(RECORD_MAGIC, image_id, mtime, length))
+                index[image_id] = (temp.tell(), length, mtime)
+                temp.write(self._map[offset:offset + length])
+        self.close()
+        os.replace(temp_path, self.path)
+        self._file = open(self.path, 'a+b')
+        self._remap()
+        self._index = index
+
+
+class ThumbnailService(QObject):
+    # превью строятся в пуле процессов и складываются в пак; GUI получает готовые QPixmap
+    # из памяти или пака, а о готовом (или невозможном) превью узнаёт по сигналу ready.
+    # файлы в GUI-потоке не трогаются: актуальность записи пака проверяет задача пула
+    ready = Signal(int)
+    rendered = Signal(int, object, object)
+
+    def __init__(self, pack_path, workers=0, parent=None):
+        super().__init__(parent)
+        self._pack = ThumbnailPack(pack_path)
+        self._workers = workers or None
+        self._executor = None
+        self._pixmaps = OrderedDict()
+        self._pending = OrderedDict()
+        self._running = {}
+        self._checked = {}
+        self._failed = set()
+        self.rendered.connect(self.on_rendered)
+
+    def pixmap(self, image_id, file_path, size=THUMBNAIL_SIZE):
+        key = (image_id, size)
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+            return pixmap
+        if image_id in self._pending or image_id in self._running or image_id in self._failed:
+            return None
+
+        # mtime из пака сверяется с файлом один раз за сессию, в задаче пула
+        mtime = self._checked.get(image_id)
+        data = self._pack.get(image_id, mtime) if mtime is not None else None
+        if data is None:
+            self.submit(image_id, file_path, self._pack.mtime(image_id))
+            return None
+
+        pixmap = QPixmap()
+        if not pixmap.loadFromData(data):
+            # повреждённая запись: превью строится заново независимо от mtime
+            self._checked.pop(image_id, None)
+            self.submit(image_id, file_path, None)
+            return None
+        if size < THUMBNAIL_SIZE:
+            pixmap = pixmap.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self._pixmaps[key] = pixmap
+        if len(self._pixmaps) > THUMBNAIL_MEMORY_ITEMS:
+            self._pixmaps.popitem(last=False)
+        return pixmap
+
+    def is_failed(self, image_id):
+        return image_id in self._failed
+
+    def submit(self, image_id, file_path, packed_mtime):
+        if self._executor is None:
+            # spawn: форк процесса с запущенным Qt небезопасен
+            self._executor = ProcessPoolExecutor(self._workers, mp_context=multiprocessing.get_context('spawn'))
+            app = QCoreApplication.instance()
+            if app is not None:
+                app.aboutToQuit.connect(self.shutdown)
+        future = self._executor.submit(refresh_thumbnail, file_path, packed_mtime, THUMBNAIL_SIZE)
+        # колбэк уже завершённой задачи вызывается сразу, поэтому задача регистрируется до него
+        self._pending[image_id] = future
+        future.add_done_callback(lambda done: self.on_done(image_id, done))
+        # при быстрой прокрутке ещё не начатые задачи для ушедших с экрана строк снимаются;
+        # уже выполняющиеся отменить нельзя, они остаются в _running, чтобы превью не заказывалось повторно
+        while len(self._pending) > THUMBNAIL_QUEUE_LIMIT:
+            stale_id, stale = self._pending.popitem(last=False)
+            if not stale.cancel():
+                self._running[stale_id] = stale
+
+    def on_done(self, image_id, future):
+        # вызывается в служебном потоке пула, в GUI-поток результат уходит через сигнал
+        if future.cancelled():
+            return
+        mtime, data = (None, None) if future.exception() else future.result()
+        self.rendered.emit(image_id, mtime, data)
+
+    def on_rendered(self, image_id, mtime, data):
+        self._pending.pop(image_id, None)
+        self._running.pop(image_id, None)
+        if mtime is None:
+            self._failed.add(image_id)
+        else:
+            if data is not None:
+                self._pack.put(image_id, mtime, data)
+            self._checked[image_id] = mtime
+        self.ready.emit(image_id)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._pending.clear()
+        self._running.clear()
+        self._pack.close()
+
+
+thumbnails = ThumbnailService(settings.THUMBNAIL_PACK_PATH, settings.THUMBNAIL_WORKERS)
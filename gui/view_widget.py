@@ -1,16 +1,25 @@
 
+from datetime import datetime
+
 from PySide6.QtWidgets import (
     QApplication, QWidget, QHBoxLayout, QVBoxLayout, QGroupBox, QCheckBox,
     QPushButton, QTableWidget, QTableWidgetItem, QScrollArea, QLabel, QMessageBox, QSizePolicy, QDialog, QHeaderView,
-    QAbstractItemView, QDateEdit, QTextEdit, QLineEdit, QDoubleSpinBox, QComboBox, QMainWindow, QSplitter
+    QAbstractItemView, QTableView, QDateEdit, QTextEdit, QLineEdit, QDoubleSpinBox, QComboBox, QMainWindow, QSplitter, QFileDialog, QTabWidget,
+    QSpinBox
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer, QSize
 
-from db.models import AttackTypeEnum
+from db.exporter import export_images
+from db.models import AttackTypeEnum, IMAGE_EXTENSIONS
 from db.requests import get_all_experiments, update_experiment, delete_experiment, get_experiment_by_id, get_all_runs, \
     delete_run, update_run, get_run_by_id, delete_image, update_image, get_all_images, get_image_by_id, \
-    get_all_images_filtered
+    get_image_row, get_summary_stats
+from gui.delegates import ButtonDelegate
+from gui.stats_widget import QueryStatsDialog
 from gui.logger_widget import initialize_qt_logger, get_qt_logger_widget
+from gui.table_models import ImagesTableModel, THUMBNAIL_COLUMN
+from gui.thumbnails import thumbnails, THUMBNAIL_SIZE
+from gui.workers import QueryStatusWidget
 from gui.styles import styles
 
 
@@ -54,11 +63,10 @@ class MergeViewWindows(QMainWindow):
                    }}
                """)
 
-        left_bottom_widget = QWidget()
-        left_bottom_widget.setStyleSheet("background-color: #e8e8e8; border-top: 1px solid #d0d0d0;")
+        self.summary_panel = SummaryPanel(self)
 
         left_layout.addWidget(self.view_dialog)
-        left_layout.addWidget(left_bottom_widget)
+        left_layout.addWidget(self.summary_panel)
 
         right_widget = QWidget()
         right_layout = QVBoxLayout(right_widget)
@@ -130,6 +138,89 @@ class MergeViewWindows(QMainWindow):
         self.form_layout.addWidget(self.current_form)
 
 
+SUMMARY_SECTIONS = (
+    ('experiments', "Эксперименты", (
+        ('experiment_id', "ID"), ('name', "Название"), ('runs', "Прогонов"), ('images', "Изображений"),
+        ('avg_accuracy', "Ср. точность"), ('flagged_runs', "Проверено"))),
+    ('attack_types', "Атаки", (
+        ('attack_type', "Тип атаки"), ('images', "Изображений"), ('avg_accuracy', "Ср. точность"),
+        ('flagged_images', "Проверено"))),
+    ('flagged', "Проверка", (
+        ('flagged', "Проверен"), ('runs', "Прогонов"), ('images', "Изображений"), ('avg_accuracy', "Ср. точность"))),
+    ('dates', "По датам", (
+        ('period', "Период"), ('runs', "Прогонов"), ('avg_accuracy', "Ср. точность"), ('flagged_runs', "Проверено"))),
+)
+
+
+class SummaryPanel(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(5, 5, 5, 5)
+
+        header_layout = QHBoxLayout()
+        header_layout.addWidget(QLabel("Сводка"))
+        self.bucket_combo = QComboBox()
+        self.bucket_combo.addItem("По дням", 'day')
+        self.bucket_combo.addItem("По неделям", 'week')
+        self.bucket_combo.addItem("По месяцам", 'month')
+        self.bucket_combo.currentIndexChanged.connect(self.load_data)
+        header_layout.addWidget(self.bucket_combo)
+        self.refresh_btn = QPushButton("Обновить")
+        self.refresh_btn.clicked.connect(self.load_data)
+        header_layout.addWidget(self.refresh_btn)
+        layout.addLayout(header_layout)
+
+        self.tabs = QTabWidget()
+        self.tables = {}
+        for key, title, columns in SUMMARY_SECTIONS:
+            table = QTableWidget()
+            table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+            table.setSelectionMode(QAbstractItemView.NoSelection)
+            table.verticalHeader().setVisible(False)
+            table.setColumnCount(len(columns))
+            table.setHorizontalHeaderLabels([header for _, header in columns])
+            table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+            self.tables[key] = table
+            self.tabs.addTab(table, title)
+        layout.addWidget(self.tabs)
+
+        self.query_status = QueryStatusWidget(self)
+        layout.addWidget(self.query_status)
+
+        self.load_data()
+
+    def load_data(self):
+        self.query_status.cancel_all()
+        self.query_status.run(
+            get_summary_stats, self.bucket_combo.currentData(),
+            on_result=self.fill_tables,
+            on_error=lambda e: QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить сводку: {str(e)}")
+        )
+
+    def fill_tables(self, stats):
+        for key, _, columns in SUMMARY_SECTIONS:
+            table = self.tables[key]
+            rows = stats[key]
+            table.setRowCount(len(rows))
+            for row, values in enumerate(rows):
+                for column, (field, _) in enumerate(columns):
+                    table.setItem(row, column, QTableWidgetItem(self.format_value(values[field])))
+
+    def format_value(self, value):
+        if value is None:
+            return "—"
+        if isinstance(value, bool):
+            return "Да" if value else "Нет"
+        if isinstance(value, float):
+            return f"{value:.3f}"
+        if isinstance(value, AttackTypeEnum):
+            return value.value
+        if isinstance(value, datetime):
+            return str(value.date())
+        return str(value)
+
+
 class ViewDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -148,9 +239,13 @@ class ViewDialog(QDialog):
         btn_image = QPushButton("посмотреть изображение")
         btn_image.clicked.connect(lambda: self.open_form(ImagesTableDialog))
 
+        btn_stats = QPushButton("статистика запросов")
+        btn_stats.clicked.connect(lambda: self.open_form(QueryStatsDialog))
+
         layout.addWidget(btn_experiment)
         layout.addWidget(btn_run)
         layout.addWidget(btn_image)
+        layout.addWidget(btn_stats)
 
         self.setLayout(layout)
 
@@ -165,20 +260,72 @@ class BaseTableDialog(QDialog):
         layout = QVBoxLayout()
         layout.setContentsMargins(15, 15, 15, 15)
 
-        self.table = QTableWidget()
+        self.table = self.create_table()
         self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.table.setFocusPolicy(Qt.NoFocus)
         self.table.setSelectionMode(QAbstractItemView.NoSelection)
         self.table.verticalHeader().setVisible(False)
         self.table.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
 
+        self.edit_delegate = ButtonDelegate("Редактировать", self.table)
+        self.edit_delegate.clicked.connect(lambda row: self.edit_item(self.item_id(row)))
+        self.table.setItemDelegateForColumn(len(self.get_columns()) - 1, self.edit_delegate)
+        self.table.doubleClicked.connect(self.on_double_clicked)
+
+        # высота строк фиксирована: ResizeToContents пересчитывал бы все строки при каждой прокрутке и ресайзе
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(self.edit_delegate.sizeHint(None, None).height() + 8)
+
+        self.query_status = QueryStatusWidget(self)
+
         layout.addWidget(self.table)
+        layout.addWidget(self.query_status)
         self.setLayout(layout)
 
-    def add_edit_button(self, row, item_id):
-        edit_btn = QPushButton("Редактировать")
-        edit_btn.clicked.connect(lambda checked, id=item_id: self.edit_item(id))
-        self.table.setCellWidget(row, self.table.columnCount()-1, edit_btn)
+    def create_table(self):
+        return QTableWidget()
+
+    def run_query(self, fn, *args, on_error=None, **kwargs):
+        return self.query_status.run(fn, *args, on_error=on_error or self.show_query_error, **kwargs)
+
+    def show_query_error(self, error):
+        QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить данные: {str(error)}")
+
+    def on_double_clicked(self, index):
+        # в колонке действий клик обрабатывает делегат
+        if index.column() != len(self.get_columns()) - 1:
+            self.edit_item(self.item_id(index.row()))
+
+    def item_id(self, row):
+        return int(self.table.item(row, 0).text())
+
+    def find_row(self, item_id):
+        for row in range(self.table.rowCount()):
+            if self.table.item(row, 0).text() == str(item_id):
+                return row
+        return None
+
+    def remove_row(self, row):
+        self.table.removeRow(row)
+
+    def apply_edit(self, action, item_id, fetch, *args):
+        # после правки меняется одна строка; полная перезагрузка нужна, только если строки уже нет в таблице
+        row = self.find_row(item_id)
+        if row is None:
+            self.load_data()
+        elif action == 'delete':
+            self.remove_row(row)
+        else:
+            self.run_query(fetch, item_id, *args, on_result=lambda item: self.patch_row(item_id, item))
+
+    def patch_row(self, item_id, item):
+        row = self.find_row(item_id)
+        if row is None:
+            self.load_data()
+        elif item is None:
+            self.remove_row(row)
+        else:
+            self.update_row(row, item)
 
 
 class BaseEditDialog(QDialog):
@@ -186,6 +333,7 @@ class BaseEditDialog(QDialog):
     def __init__(self, item, parent=None):
         super().__init__(parent)
         self.item = item
+        self.action = None
         self.setFixedSize(600, 400)
         self.init_ui()
 
@@ -203,13 +351,30 @@ class BaseEditDialog(QDialog):
         button_layout.addWidget(self.delete_btn)
         button_layout.addWidget(self.cancel_btn)
 
+        self.query_status = QueryStatusWidget(self)
+        self.query_status.busy_changed.connect(self.on_busy_changed)
+
         layout.addLayout(button_layout)
+        layout.addWidget(self.query_status)
         self.setLayout(layout)
 
         self.save_btn.clicked.connect(self.save_changes)
         self.delete_btn.clicked.connect(self.delete_item)
         self.cancel_btn.clicked.connect(self.reject)
 
+    def on_busy_changed(self, busy):
+        self.save_btn.setEnabled(not busy)
+        self.delete_btn.setEnabled(not busy)
+
+    def on_saved(self, item_id):
+        # функции обновления возвращают None, если запись уже удалена
+        self.action = 'update' if item_id is not None else 'delete'
+        self.accept()
+
+    def on_deleted(self, item_id=None):
+        self.action = 'delete'
+        self.accept()
+
 
 class ExperimentsTableDialog(BaseTableDialog):
     def __init__(self, parent=None):
@@ -221,41 +386,44 @@ class ExperimentsTableDialog(BaseTableDialog):
         return ["ID", "Название", "Описание", "Дата создания", "Действия"]
 
     def load_data(self):
-        result = get_all_experiments()
+        self.run_query(get_all_experiments, on_result=self.fill_table)
 
+    def fill_table(self, result):
         self.table.setColumnCount(len(self.get_columns()))
         self.table.setHorizontalHeaderLabels(self.get_columns())
 
         self.table.setRowCount(len(result))
 
         for row, exp in enumerate(result):
-            id_item = QTableWidgetItem(str(exp.experiment_id))
-            name_item = QTableWidgetItem(exp.name or "")
-            desc_item = QTableWidgetItem(exp.description or "")
-            date_item = QTableWidgetItem(str(exp.created_date))
-
-            for item in [id_item, name_item, desc_item, date_item]:
-                item.setFlags(Qt.ItemIsEnabled)
-
-            self.table.setItem(row, 0, id_item)
-            self.table.setItem(row, 1, name_item)
-            self.table.setItem(row, 2, desc_item)
-            self.table.setItem(row, 3, date_item)
+            self.update_row(row, exp)
 
-            self.add_edit_button(row, exp.experiment_id)
-
-        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
         self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
         self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
         self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
         self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeToContents)
         self.table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
 
+    def update_row(self, row, exp):
+        id_item = QTableWidgetItem(str(exp.experiment_id))
+        name_item = QTableWidgetItem(exp.name or "")
+        desc_item = QTableWidgetItem(exp.description or "")
+        date_item = QTableWidgetItem(str(exp.created_date))
+
+        for item in [id_item, name_item, desc_item, date_item]:
+            item.setFlags(Qt.ItemIsEnabled)
+
+        self.table.setItem(row, 0, id_item)
+        self.table.setItem(row, 1, name_item)
+        self.table.setItem(row, 2, desc_item)
+        self.table.setItem(row, 3, date_item)
+
     def edit_item(self, experiment_id):
-        experiment = get_experiment_by_id(experiment_id)
+        self.run_query(get_experiment_by_id, experiment_id, on_result=self.open_edit_dialog)
+
+    def open_edit_dialog(self, experiment):
         dialog = EditExperimentDialog(experiment, self)
         if dialog.exec() == QDialog.Accepted:
-            self.load_data()
+            self.apply_edit(dialog.action, experiment.experiment_id, get_experiment_by_id)
 
 
 class EditExperimentDialog(BaseEditDialog):
@@ -293,11 +461,11 @@ class EditExperimentDialog(BaseEditDialog):
         name = self.name_edit.text()
         description = self.desc_edit.toPlainText()
 
-        try:
-            update_experiment(self.item.experiment_id, name, description)
-            self.accept()
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось обновить эксперимент: {str(e)}")
+        self.query_status.run(
+            update_experiment, self.item.experiment_id, name, description,
+            on_result=self.on_saved,
+            on_error=lambda e: QMessageBox.critical(self, "Ошибка", f"Не удалось обновить эксперимент: {str(e)}")
+        )
 
     def delete_item(self):
         reply = QMessageBox.question(
@@ -309,11 +477,11 @@ class EditExperimentDialog(BaseEditDialog):
         )
 
         if reply == QMessageBox.Yes:
-            try:
-                delete_experiment(self.item.experiment_id)
-                self.accept()
-            except Exception as e:
-                QMessageBox.critical(self, "Ошибка", f"Не удалось удалить эксперимент: {str(e)}")
+            self.query_status.run(
+                delete_experiment, self.item.experiment_id,
+                on_result=self.on_deleted,
+                on_error=lambda e: QMessageBox.critical(self, "Ошибка", f"Не удалось удалить эксперимент: {str(e)}")
+            )
 
 
 class RunsTableDialog(BaseTableDialog):
@@ -326,32 +494,17 @@ class RunsTableDialog(BaseTableDialog):
         return ["ID", "ID эксперимента", "Время запуска", "Точность", "Проверен", "Действия"]
 
     def load_data(self):
-        result = get_all_runs()
+        self.run_query(get_all_runs, on_result=self.fill_table)
 
+    def fill_table(self, result):
         self.table.setColumnCount(len(self.get_columns()))
         self.table.setHorizontalHeaderLabels(self.get_columns())
 
         self.table.setRowCount(len(result))
 
         for row, run in enumerate(result):
-            id_item = QTableWidgetItem(str(run.run_id))
-            exp_id_item = QTableWidgetItem(str(run.experiment_id))
-            time_item = QTableWidgetItem(str(run.run_date))
-            accuracy_item = QTableWidgetItem(str(run.accuracy))
-            flagged_item = QTableWidgetItem("Да" if run.flagged else "Нет")
-
-            for item in [id_item, exp_id_item, time_item, accuracy_item, flagged_item]:
-                item.setFlags(Qt.ItemIsEnabled)
-
-            self.table.setItem(row, 0, id_item)
-            self.table.setItem(row, 1, exp_id_item)
-            self.table.setItem(row, 2, time_item)
-            self.table.setItem(row, 3, accuracy_item)
-            self.table.setItem(row, 4, flagged_item)
+            self.update_row(row, run)
 
-            self.add_edit_button(row, run.run_id)
-
-        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
         self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
         self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
         self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
@@ -359,11 +512,29 @@ class RunsTableDialog(BaseTableDialog):
         self.table.horizontalHeader().setSectionResizeMode(4, QHeaderView.ResizeToContents)
         self.table.horizontalHeader().setSectionResizeMode(5, QHeaderView.Stretch)
 
+    def update_row(self, row, run):
+        id_item = QTableWidgetItem(str(run.run_id))
+        exp_id_item = QTableWidgetItem(str(run.experiment_id))
+        time_item = QTableWidgetItem(str(run.run_date))
+        accuracy_item = QTableWidgetItem(str(run.accuracy))
+        flagged_item = QTableWidgetItem("Да" if run.flagged else "Нет")
+
+        for item in [id_item, exp_id_item, time_item, accuracy_item, flagged_item]:
+            item.setFlags(Qt.ItemIsEnabled)
+
+        self.table.setItem(row, 0, id_item)
+        self.table.setItem(row, 1, exp_id_item)
+        self.table.setItem(row, 2, time_item)
+        self.table.setItem(row, 3, accuracy_item)
+        self.table.setItem(row, 4, flagged_item)
+
     def edit_item(self, run_id):
-        run = get_run_by_id(run_id)
+        self.run_query(get_run_by_id, run_id, on_result=self.open_edit_dialog)
+
+    def open_edit_dialog(self, run):
         dialog = EditRunDialog(run, self)
         if dialog.exec() == QDialog.Accepted:
-            self.load_data()
+            self.apply_edit(dialog.action, run.run_id, get_run_by_id)
 
 
 class EditRunDialog(BaseEditDialog):
@@ -410,11 +581,11 @@ class EditRunDialog(BaseEditDialog):
         accuracy = self.accuracy_spin.value()
         flagged = self.verified_checkbox.isChecked()
 
-        try:
-            update_run(experiment_id, self.item.run_id, accuracy, flagged)
-            self.accept()
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось обновить прогон: {str(e)}")
+        self.query_status.run(
+            update_run, experiment_id, self.item.run_id, accuracy, flagged,
+            on_result=self.on_saved,
+            on_error=lambda e: QMessageBox.critical(self, "Ошибка", f"Не удалось обновить прогон: {str(e)}")
+        )
 
     def delete_item(self):
         reply = QMessageBox.question(
@@ -426,11 +597,15 @@ class EditRunDialog(BaseEditDialog):
         )
 
         if reply == QMessageBox.Yes:
-            try:
-                delete_run(self.item.run_id)
-                self.accept()
-            except Exception as e:
-                QMessageBox.critical(self, "Ошибка", f"Не удалось удалить прогон: {str(e)}")
+            self.query_status.run(
+                delete_run, self.item.run_id,
+                on_result=self.on_deleted,
+                on_error=lambda e: QMessageBox.critical(self, "Ошибка", f"Не удалось удалить прогон: {str(e)}")
+            )
+
+
+FILTER_DEBOUNCE_MS = 300
+TABLE_THUMBNAIL_SIZE = 64
 
 
 class ImagesTableDialog(BaseTableDialog):
@@ -440,30 +615,77 @@ class ImagesTableDialog(BaseTableDialog):
         self.filters = {
             'sort_id': None,
             'file_type': None,
-            'attack_type': None
+            'attack_type': None,
+            'search': None,
+            'region': None,
+            'region_mode': None,
+            'min_area': None,
+            'max_area': None,
+            'duplicates': None
         }
         self.init_filters()
+        self.init_model()
         self.load_data()
 
+    def create_table(self):
+        return QTableView()
+
+    def init_model(self):
+        self.model = ImagesTableModel(self.get_columns(), self, runner=self.query_status.run, thumbnails=thumbnails,
+                                      thumbnail_size=TABLE_THUMBNAIL_SIZE)
+        self.model.load_failed.connect(self.show_query_error)
+        self.table.setModel(self.model)
+
+        self.table.setIconSize(QSize(TABLE_THUMBNAIL_SIZE, TABLE_THUMBNAIL_SIZE))
+        row_height = self.table.verticalHeader().defaultSectionSize()
+        self.table.verticalHeader().setDefaultSectionSize(max(row_height, TABLE_THUMBNAIL_SIZE + 4))
+
+        # ширина колонки превью задана явно: ResizeToContents запросил бы превью и для невидимых строк
+        self.table.horizontalHeader().setSectionResizeMode(THUMBNAIL_COLUMN, QHeaderView.Fixed)
+        self.table.horizontalHeader().resizeSection(THUMBNAIL_COLUMN, TABLE_THUMBNAIL_SIZE + 8)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
+        self.table.horizontalHeader().setSectionResizeMode(5, QHeaderView.Stretch)
+        self.table.horizontalHeader().setSectionResizeMode(6, QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(7, QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(8, QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(9, QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(10, QHeaderView.Stretch)
+
     def init_filters(self):
+        # смена фильтров откладывается, чтобы серия переключений дала один запрос с итоговым состоянием
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(FILTER_DEBOUNCE_MS)
+        self.filter_timer.timeout.connect(self.apply_filters)
+
         filter_widget = QWidget()
         filter_layout = QHBoxLayout(filter_widget)
 
+        filter_layout.addWidget(QLabel("Поиск:"))
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("часть имени или пути, /каталог/ - по префиксу")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.textChanged.connect(lambda *_: self.filter_timer.start())
+        self.search_edit.returnPressed.connect(self.apply_filters)
+        filter_layout.addWidget(self.search_edit)
+
         filter_layout.addWidget(QLabel("Сортировка ID:"))
         self.sort_id_combo = QComboBox()
         self.sort_id_combo.addItem("Не сортировать", None)
         self.sort_id_combo.addItem("По возрастанию", 'asc')
         self.sort_id_combo.addItem("По убыванию", 'desc')
-        self.sort_id_combo.currentIndexChanged.connect(self.apply_filters)
+        self.sort_id_combo.currentIndexChanged.connect(lambda *_: self.filter_timer.start())
         filter_layout.addWidget(self.sort_id_combo)
 
         filter_layout.addWidget(QLabel("Тип файла:"))
         self.file_type_combo = QComboBox()
         self.file_type_combo.addItem("Все типы", None)
-        self.file_type_combo.addItem(".png", ".png")
-        self.file_type_combo.addItem(".jpg", ".jpg")
-        self.file_type_combo.addItem(".jpeg", ".jpeg")
-        self.file_type_combo.currentIndexChanged.connect(self.apply_filters)
+        for extension in IMAGE_EXTENSIONS:
+            self.file_type_combo.addItem(extension, extension)
+        self.file_type_combo.currentIndexChanged.connect(lambda *_: self.filter_timer.start())
         filter_layout.addWidget(self.file_type_combo)
 
         filter_layout.addWidget(QLabel("Тип атаки:"))
@@ -471,88 +693,148 @@ class ImagesTableDialog(BaseTableDialog):
         self.attack_type_combo.addItem("Все типы", None)
         for attack_type in AttackTypeEnum:
             self.attack_type_combo.addItem(attack_type.value, attack_type.value)
-        self.attack_type_combo.currentIndexChanged.connect(self.apply_filters)
+        self.attack_type_combo.currentIndexChanged.connect(lambda *_: self.filter_timer.start())
         filter_layout.addWidget(self.attack_type_combo)
 
         self.reset_btn = QPushButton("Сбросить фильтры")
         self.reset_btn.clicked.connect(self.reset_filters)
         filter_layout.addWidget(self.reset_btn)
 
+        self.export_btn = QPushButton("Экспорт")
+        self.export_btn.clicked.connect(self.export_data)
+        filter_layout.addWidget(self.export_btn)
+
+        region_widget = QWidget()
+        region_layout = QHBoxLayout(region_widget)
+
+        region_layout.addWidget(QLabel("Рамка:"))
+        self.region_mode_combo = QComboBox()
+        self.region_mode_combo.addItem("Любая", None)
+        self.region_mode_combo.addItem("Пересекает область", 'overlaps')
+        self.region_mode_combo.addItem("Внутри области", 'within')
+        self.region_mode_combo.addItem("Содержит область", 'contains')
+        self.region_mode_combo.currentIndexChanged.connect(lambda *_: self.filter_timer.start())
+        region_layout.addWidget(self.region_mode_combo)
+
+        self.region_spins = []
+        for label in ("x1:", "y1:", "x2:", "y2:"):
+            region_layout.addWidget(QLabel(label))
+            spin = QSpinBox()
+            spin.setRange(0, 100000)
+            spin.valueChanged.connect(lambda *_: self.filter_timer.start())
+            region_layout.addWidget(spin)
+            self.region_spins.append(spin)
+
+        self.area_spins = []
+        for label in ("Площадь от:", "до:"):
+            region_layout.addWidget(QLabel(label))
+            spin = QSpinBox()
+            spin.setRange(0, 1000000000)
+            spin.setSpecialValueText("—")
+            spin.valueChanged.connect(lambda *_: self.filter_timer.start())
+            region_layout.addWidget(spin)
+            self.area_spins.append(spin)
+
+        self.duplicates_check = QCheckBox("Только дубликаты")
+        self.duplicates_check.setToolTip("Изображения, содержимое которых совпадает с другими записями")
+        self.duplicates_check.toggled.connect(lambda *_: self.filter_timer.start())
+        region_layout.addWidget(self.duplicates_check)
+        region_layout.addStretch()
+
         main_layout = self.layout()
         main_layout.insertWidget(0, filter_widget)
+        main_layout.insertWidget(1, region_widget)
+
+    def current_filters(self):
+        return {
+            'sort_id': self.sort_id_combo.currentData(),
+            'file_type': self.file_type_combo.currentData(),
+            'attack_type': self.attack_type_combo.currentData(),
+            'search': self.search_edit.text().strip() or None,
+            'region': self.current_region(),
+            'region_mode': self.region_mode_combo.currentData(),
+            'min_area': self.area_spins[0].value() or None,
+            'max_area': self.area_spins[1].value() or None,
+            'duplicates': self.duplicates_check.isChecked() or None
+        }
+
+    def current_region(self):
+        if self.region_mode_combo.currentData() is None:
+            return None
+        x1, y1, x2, y2 = (spin.value() for spin in self.region_spins)
+        return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
 
     def apply_filters(self):
-        self.filters['sort_id'] = self.sort_id_combo.currentData()
-        self.filters['attack_type'] = self.attack_type_combo.currentData()
-        self.filters['file_type'] = self.file_type_combo.currentData()
+        self.filter_timer.stop()
+        filters = self.current_filters()
+        if filters == self.filters:
+            return
+        self.filters = filters
 
         self.load_data()
 
     def reset_filters(self):
-        self.sort_id_combo.setCurrentIndex(0)
-        self.attack_type_combo.setCurrentIndex(0)
-        self.file_type_combo.setCurrentIndex(0)
-        self.filters = {
-            'sort_id': None,
-            'file_type': None,
-            'attack_type': None
-        }
+        self.filter_timer.stop()
+        for combo in (self.sort_id_combo, self.attack_type_combo, self.file_type_combo, self.region_mode_combo):
+            combo.blockSignals(True)
+            combo.setCurrentIndex(0)
+            combo.blockSignals(False)
+        for spin in self.region_spins + self.area_spins:
+            spin.blockSignals(True)
+            spin.setValue(0)
+            spin.blockSignals(False)
+        self.search_edit.blockSignals(True)
+        self.search_edit.clear()
+        self.search_edit.blockSignals(False)
+        self.duplicates_check.blockSignals(True)
+        self.duplicates_check.setChecked(False)
+        self.duplicates_check.blockSignals(False)
+        self.filters = self.current_filters()
         self.load_data()
 
+    def export_data(self):
+        path, selected_filter = QFileDialog.getSaveFileName(
+            self, "Экспорт изображений", "images.csv",
+            "CSV (*.csv);;JSONL (*.jsonl)"
+        )
+        if not path:
+            return
+        fmt = 'jsonl' if path.endswith('.jsonl') or selected_filter.startswith('JSONL') else 'csv'
+        self.run_query(
+            export_images, dict(self.filters), path, fmt,
+            on_result=lambda count: QMessageBox.information(self, "Экспорт", f"Выгружено строк: {count}"),
+            on_error=lambda e: QMessageBox.critical(self, "Ошибка", f"Не удалось выгрузить изображения: {str(e)}"),
+            report_progress=True,
+            message="Экспорт..."
+        )
+
     def get_columns(self):
-        return ["ID", "ID прогона", "ID эксперимента", "Путь к файлу", "Имя", "Дата добавления", "Координаты", "Тип атаки",
-                "Действия"]
+        return ["Превью", "ID", "ID прогона", "ID эксперимента", "Путь к файлу", "Имя", "Дата добавления", "Координаты",
+                "Тип атаки", "Хэш", "Действия"]
 
     def load_data(self):
-        result = get_all_images_filtered(self.filters)
-
-        self.table.setColumnCount(len(self.get_columns()))
-        self.table.setHorizontalHeaderLabels(self.get_columns())
+        self.model.set_filters(self.filters)
 
-        self.table.setRowCount(len(result))
-
-        for row, image in enumerate(result):
-            id_item = QTableWidgetItem(str(image.image_id))
-            run_id_item = QTableWidgetItem(str(image.run_id))
-            experiment_item = QTableWidgetItem(str(getattr(image, 'experiment_id', '')))
-            path_item = QTableWidgetItem(image.file_path)
-            name_item = QTableWidgetItem(image.original_name)
-            date_item = QTableWidgetItem(str(image.added_date))
-            coords_item = QTableWidgetItem(str(image.coordinates))
-            attack_item = QTableWidgetItem(image.attack_type)
-
-            for item in [id_item, run_id_item, experiment_item, path_item, name_item, date_item, coords_item,
-                         attack_item]:
-                item.setFlags(Qt.ItemIsEnabled)
-
-            self.table.setItem(row, 0, id_item)
-            self.table.setItem(row, 1, run_id_item)
-            self.table.setItem(row, 2, experiment_item)
-            self.table.setItem(row, 3, path_item)
-            self.table.setItem(row, 4, name_item)
-            self.table.setItem(row, 5, date_item)
-            self.table.setItem(row, 6, coords_item)
-            self.table.setItem(row, 7, attack_item)
-
-            self.add_edit_button(row, image.image_id)
-
-
-        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
-        self.table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
-        self.table.horizontalHeader().setSectionResizeMode(5, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(6, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(7, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(8, QHeaderView.Stretch)
+    def item_id(self, row):
+        return self.model.image_id(row)
 
     def edit_item(self, image_id):
-        image = get_image_by_id(image_id)
+        self.run_query(get_image_by_id, image_id, on_result=self.open_edit_dialog)
+
+    def open_edit_dialog(self, image):
         dialog = EditImageDialog(image, self)
         if dialog.exec() == QDialog.Accepted:
-            self.load_data()
+            # строка перечитывается с текущими фильтрами: если правка вывела её из выборки, она убирается
+            self.apply_edit(dialog.action, image.image_id, get_image_row, dict(self.filters))
+
+    def find_row(self, image_id):
+        return self.model.find_row(image_id)
+
+    def remove_row(self, row):
+        self.model.remove_row(row)
+
+    def update_row(self, row, image):
+        self.model.update_row(row, image)
 
 
 class EditImageDialog(BaseEditDialog):
@@ -569,6 +851,7 @@ class EditImageDialog(BaseEditDialog):
     def setup_fields(self):
         main_layout = self.layout()
 
+        top_layout = QHBoxLayout()
         fields_layout = QVBoxLayout()
 
         fields_layout.addWidget(QLabel("ID:"))
@@ -595,6 +878,11 @@ class EditImageDialog(BaseEditDialog):
         self.coords_label = QLabel(str(self.item.coordinates))
         fields_layout.addWidget(self.coords_label)
 
+        fields_layout.addWidget(QLabel("Хэш содержимого:"))
+        self.hash_label = QLabel(self.item.content_hash or "не посчитан")
+        self.hash_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        fields_layout.addWidget(self.hash_label)
+
         fields_layout.addWidget(QLabel("Тип атаки:"))
         self.attack_type_combo = QComboBox()
         for attack_type in AttackTypeEnum:
@@ -604,16 +892,38 @@ class EditImageDialog(BaseEditDialog):
             self.attack_type_combo.setCurrentIndex(current_index)
         fields_layout.addWidget(self.attack_type_combo)
 
-        main_layout.insertLayout(0, fields_layout)
+        # превью берётся из пака, оригинал не декодируется
+        self.preview_label = QLabel("Превью строится...")
+        self.preview_label.setFixedSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+        self.preview_label.setAlignment(Qt.AlignCenter)
+        self.preview_label.setWordWrap(True)
+        thumbnails.ready.connect(self.on_thumbnail_ready)
+        self.finished.connect(lambda: thumbnails.ready.disconnect(self.on_thumbnail_ready))
+        self.show_preview()
+
+        top_layout.addLayout(fields_layout)
+        top_layout.addWidget(self.preview_label, alignment=Qt.AlignTop)
+        main_layout.insertLayout(0, top_layout)
+
+    def show_preview(self):
+        pixmap = thumbnails.pixmap(self.item.image_id, self.item.file_path)
+        if pixmap is not None:
+            self.preview_label.setPixmap(pixmap)
+        elif thumbnails.is_failed(self.item.image_id):
+            self.preview_label.setText("Файл недоступен")
+
+    def on_thumbnail_ready(self, image_id):
+        if image_id == self.item.image_id:
+            self.show_preview()
 
     def save_changes(self):
         attack_type = self.attack_type_combo.currentData()
         run_id = self.run_id_label.text()
-        try:
-            update_image(self.item.image_id, run_id, attack_type)
-            self.accept()
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось обновить изображение: {str(e)}")
+        self.query_status.run(
+            update_image, self.item.image_id, run_id, attack_type,
+            on_result=self.on_saved,
+            on_error=lambda e: QMessageBox.critical(self, "Ошибка", f"Не удалось обновить изображение: {str(e)}")
+        )
 
     def delete_item(self):
         reply = QMessageBox.question(
@@ -625,8 +935,8 @@ class EditImageDialog(BaseEditDialog):
         )
 
         if reply == QMessageBox.Yes:
-            try:
-                delete_image(self.item.image_id)
-                self.accept()
-            except Exception as e:
-                QMessageBox.critical(self, "Ошибка", f"Не удалось удалить изображение: {str(e)}")
\ No newline at end of file
+            self.query_status.run(
+                delete_image, self.item.image_id,
+                on_result=self.on_deleted,
+                on_error=lambda e: QMessageBox.critical(self, "Ошибка", f"Не удалось удалить изображение: {str(e)}")
+            )
\ No newline at end of file
@@ -0,0 +1,137 @@
+import logging
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+from PySide6.QtWidgets import QWidget, QHBoxLayout, QLabel, QProgressBar, QPushButton
+
+from db.database import QueryTicket, set_query_ticket
+
+logger = logging.getLogger(__name__)
+
+_active_tasks = set()
+
+
+class QuerySignals(QObject):
+    finished = Signal(object)
+    failed = Signal(object)
+    cancelled = Signal()
+    progress = Signal(int)
+
+
+class QueryTask(QRunnable):
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.ticket = QueryTicket()
+        self.signals = QuerySignals()
+        self.setAutoDelete(False)
+
+    def run(self):
+        set_query_ticket(self.ticket)
+        try:
+            if self.ticket.cancelled:
+                self.signals.cancelled.emit()
+                return
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as exc:
+            if self.ticket.cancelled:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.failed.emit(exc)
+        else:
+            if self.ticket.cancelled:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.finished.emit(result)
+        finally:
+            set_query_ticket(None)
+
+    def cancel(self):
+        try:
+            self.ticket.cancel()
+        except Exception:
+            logger.exception("Не удалось отменить запрос")
+
+    @property
+    def is_cancelled(self):
+        return self.ticket.cancelled
+
+
+def run_query(fn, *args, on_result=None, on_error=None, on_cancel=None, on_progress=None, **kwargs):
+    task = QueryTask(fn, *args, **kwargs)
+    if on_progress is not None:
+        task.kwargs['progress'] = task.signals.progress.emit
+        task.signals.progress.connect(on_progress)
+    if on_result is not None:
+        task.signals.finished.connect(on_result)
+    if on_error is not None:
+        task.signals.failed.connect(on_error)
+    if on_cancel is not None:
+        task.signals.cancelled.connect(on_cancel)
+
+    # ссылка держит python-объект задачи (и её сигналы) живым до завершения
+    _active_tasks.add(task)
+    for signal in (task.signals.finished, task.signals.failed, task.signals.cancelled):
+        signal.connect(lambda *_, t=task: _active_tasks.discard(t))
+
+    QThreadPool.globalInstance().start(task)
+    return task
+
+
+class QueryStatusWidget(QWidget):
+    busy_changed = Signal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._tasks = set()
+
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.message_label = QLabel("")
+        layout.addWidget(self.message_label)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.setMaximumHeight(12)
+        layout.addWidget(self.progress_bar)
+
+        self.cancel_btn = QPushButton("Отменить")
+        self.cancel_btn.clicked.connect(self.cancel_all)
+        layout.addWidget(self.cancel_btn)
+
+        tasks = self._tasks
+        self.destroyed.connect(lambda *_: [task.cancel() for task in list(tasks)])
+        self.hide()
+
+    def run(self, fn, *args, on_result=None, on_error=None, on_cancel=None, report_progress=False,
+            message="Выполняется запрос...", **kwargs):
+        task = run_query(fn, *args, on_result=on_result, on_error=on_error, on_cancel=on_cancel,
+                         on_progress=self.show_progress if report_progress else None, **kwargs)
+        for signal in (task.signals.finished, task.signals.failed, task.signals.cancelled):
+            signal.connect(self.on_task_done)
+        self._tasks.add(task)
+        self.message_label.setText(message)
+        self.update_state()
+        return task
+
+    @property
+    def busy(self):
+        return bool(self._tasks)
+
+    def show_progress(self, count):
+        self.message_label.setText(f"Обработано строк: {count}")
+
+    def on_task_done(self, *args):
+        self._tasks.difference_update([task for task in self._tasks if task.signals is self.sender()])
+        self.update_state()
+
+    def cancel_all(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+    def update_state(self):
+        self.setVisible(self.busy)
+        self.busy_changed.emit(self.busy)